@@ -14,6 +14,7 @@ from datetime import datetime
 import json
 import pandas as pd
 import glob
+import logging
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
@@ -24,6 +25,9 @@ from utils.gemini_handler import GeminiHandler
 from utils.copilot_handler import CopilotHandler
 from utils.text_parser import TextParser
 
+# Configured once for the process; the handlers only create their own loggers
+logging.basicConfig(level=logging.INFO)
+
 app = FastAPI(title="AI Visibility Tester API", version="1.0.0")
 
 # Configure CORS for Vercel frontend
@@ -2,6 +2,7 @@
 
 import sys
 import os
+import re
 import yaml
 import argparse
 import subprocess
@@ -13,6 +14,9 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
+# Leading "N. " list numbering on a query line
+NUM_PREFIX_RE = re.compile(r'^\s*\d+\.\s+')
+
 def load_config(config_path: str) -> dict:
     """Load configuration from YAML file."""
     try:
@@ -132,22 +136,13 @@ def generate_combined_queries(config: dict, provider_queries: dict) -> str:
         if queries_path and os.path.exists(queries_path):
             try:
                 with open(queries_path, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
-
-                for line in lines:
-                    line = line.strip()
-                    if line and not line.startswith('#') and not line.startswith('Total queries:'):
-                        # Remove numbering if present (handle format like "1. query text")
-                        if line and line[0].isdigit() and '. ' in line:
-                            # Find the first occurrence of '. ' and take everything after it
-                            dot_index = line.find('. ')
-                            if dot_index > 0:
-                                query = line[dot_index + 2:].strip()
-                                if query:
-                                    all_queries.add(query)
-                        elif line and not line[0].isdigit():
-                            # Line without numbering
-                            all_queries.add(line)
+                    for line in f:
+                        line = line.strip()
+                        if line and not line.startswith('#') and not line.startswith('Total queries:'):
+                            # Remove numbering if present (handle format like "1. query text")
+                            query = NUM_PREFIX_RE.sub('', line, count=1)
+                            if query:
+                                all_queries.add(query)
             except Exception as e:
                 print(f"Error reading queries from {provider}: {e}")
 
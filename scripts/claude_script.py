@@ -5,18 +5,20 @@ import os
 import yaml
 import argparse
 from datetime import datetime
+from pathlib import Path
 import logging
 from dotenv import load_dotenv
 
-# Load environment variables from .env file in parent directory
-env_path = os.path.join(os.path.dirname(__file__), '..', '.env')
-load_dotenv(env_path)
+# Project paths, resolved once at import
+ROOT = Path(__file__).resolve().parent.parent
+PROMPTS_DIR = ROOT / 'prompts'
+ENV_PATH = ROOT / '.env'
 
-# Add utils to path
-sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+# Load environment variables from .env file in parent directory
+load_dotenv(ENV_PATH)
 
-from utils.claude_handler import ClaudeHandler
-from utils.text_parser import TextParser
+# Add utils to path; provider modules are imported where they are first used
+sys.path.append(str(ROOT))
 
 def load_config(config_path: str) -> dict:
     """Load configuration from YAML file."""
@@ -30,34 +32,11 @@ def load_config(config_path: str) -> dict:
 def load_prompt_template(prompt_path: str) -> str:
     """Load prompt template from file."""
     try:
-        with open(prompt_path, 'r', encoding='utf-8') as f:
-            return f.read()
+        return Path(prompt_path).read_text(encoding='utf-8')
     except Exception as e:
         print(f"Error loading prompt template: {e}")
         sys.exit(1)
 
-def load_queries(queries_path: str) -> list:
-    """Load queries from file."""
-    try:
-        with open(queries_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-
-        queries = []
-        for line in lines:
-            line = line.strip()
-            if line and not line.startswith('#') and not line.startswith('Total queries:'):
-                # Remove numbering if present
-                if '. ' in line:
-                    query = line.split('. ', 1)[1]
-                    queries.append(query)
-                elif line:
-                    queries.append(line)
-
-        return queries
-    except Exception as e:
-        print(f"Error loading queries: {e}")
-        sys.exit(1)
-
 def generate_queries(config: dict) -> str:
     """Generate queries using Claude."""
     # Check if Claude is enabled
@@ -72,8 +51,10 @@ def generate_queries(config: dict) -> str:
         return None
 
     # Initialize Claude handler
+    from utils.handler_cache import get_handler
     try:
-        handler = ClaudeHandler(
+        handler = get_handler(
+            'claude',
             api_key=api_key,
             model=config.get('claude_model', 'claude-3-haiku-20240307'),
             temperature=config.get('temperature', 0.7),
@@ -85,7 +66,7 @@ def generate_queries(config: dict) -> str:
         return None
 
     # Load prompt template
-    template_path = os.path.join(os.path.dirname(__file__), '..', 'prompts', 'query_generation_prompt.txt')
+    template_path = PROMPTS_DIR / 'query_generation_prompt.txt'
     prompt_template = load_prompt_template(template_path)
 
     # Generate queries
@@ -115,7 +96,12 @@ def collect_responses(config: dict, queries_path: str, test_run_id: str = None)
         return None
 
     # Load queries
-    queries = load_queries(queries_path)
+    from utils.text_parser import load_queries
+    try:
+        queries = load_queries(queries_path)
+    except Exception as e:
+        print(f"Error loading queries: {e}")
+        sys.exit(1)
     if not queries:
         print("No queries found to process")
         return None
@@ -123,8 +109,10 @@ def collect_responses(config: dict, queries_path: str, test_run_id: str = None)
     print(f"Processing {len(queries)} queries with Claude...")
 
     # Initialize Claude handler
+    from utils.handler_cache import get_handler
     try:
-        handler = ClaudeHandler(
+        handler = get_handler(
+            'claude',
             api_key=api_key,
             model=config.get('claude_model', 'claude-3-haiku-20240307'),
             temperature=config.get('temperature', 0.7),
@@ -140,14 +128,7 @@ def collect_responses(config: dict, queries_path: str, test_run_id: str = None)
         percentage = (current / total) * 100
         print(f"Claude progress: {current}/{total} ({percentage:.1f}%)")
 
-    # Get responses
-    results = handler.get_multiple_responses(queries, progress_callback)
-
-    if not results:
-        print("No responses collected")
-        return None
-
-    # Save results
+    # Prepare output path
     output_dir = config.get('output_directory', './results')
     business_name = config['business_name'].replace(' ', '_').replace('/', '_')
     business_dir = os.path.join(output_dir, business_name)
@@ -163,27 +144,23 @@ def collect_responses(config: dict, queries_path: str, test_run_id: str = None)
 
     output_path = os.path.join(business_dir, output_filename)
 
-    # Write CSV
+    # Get responses, writing each row to the CSV in the background as it arrives
     try:
-        import csv
-        with open(output_path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['Query ID', 'Query Text', 'Provider', 'Response Text'])
-
-            for result in results:
-                writer.writerow([
-                    result['query_id'],
-                    result['query_text'],
-                    result['provider'],
-                    result['response_text']
-                ])
-
-        print(f"Claude responses saved to: {output_path}")
-        return output_path
+        from utils.response_writer import ResponseWriter
+        with ResponseWriter(output_path) as writer:
+            results = handler.get_multiple_responses(queries, progress_callback, result_callback=writer.write)
     except Exception as e:
         print(f"Error saving responses: {e}")
         return None
 
+    if not results:
+        print("No responses collected")
+        os.remove(output_path)
+        return None
+
+    print(f"Claude responses saved to: {output_path}")
+    return output_path
+
 def main():
     parser = argparse.ArgumentParser(description='Claude AI Visibility Testing')
     parser.add_argument('--config', default='config.yaml', help='Path to configuration file')
@@ -194,6 +171,8 @@ def main():
 
     args = parser.parse_args()
 
+    logging.basicConfig(level=logging.INFO)
+
     # Load configuration
     config = load_config(args.config)
 
@@ -206,6 +185,7 @@ def main():
             sys.exit(1)
 
         # Parse and save queries
+        from utils.text_parser import TextParser
         parser = TextParser()
         queries = parser.parse_queries_from_response(queries_response)
 
@@ -5,18 +5,20 @@ import os
 import yaml
 import argparse
 from datetime import datetime
+from pathlib import Path
 import logging
 from dotenv import load_dotenv
 
-# Load environment variables from .env file in parent directory
-env_path = os.path.join(os.path.dirname(__file__), '..', '.env')
-load_dotenv(env_path)
+# Project paths, resolved once at import
+ROOT = Path(__file__).resolve().parent.parent
+PROMPTS_DIR = ROOT / 'prompts'
+ENV_PATH = ROOT / '.env'
 
-# Add utils to path
-sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+# Load environment variables from .env file in parent directory
+load_dotenv(ENV_PATH)
 
-from utils.copilot_handler import CopilotHandler
-from utils.text_parser import TextParser
+# Add utils to path; provider modules are imported where they are first used
+sys.path.append(str(ROOT))
 
 def load_config(config_path: str) -> dict:
     """Load configuration from YAML file."""
@@ -30,34 +32,11 @@ def load_config(config_path: str) -> dict:
 def load_prompt_template(prompt_path: str) -> str:
     """Load prompt template from file."""
     try:
-        with open(prompt_path, 'r', encoding='utf-8') as f:
-            return f.read()
+        return Path(prompt_path).read_text(encoding='utf-8')
     except Exception as e:
         print(f"Error loading prompt template: {e}")
         sys.exit(1)
 
-def load_queries(queries_path: str) -> list:
-    """Load queries from file."""
-    try:
-        with open(queries_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-
-        queries = []
-        for line in lines:
-            line = line.strip()
-            if line and not line.startswith('#') and not line.startswith('Total queries:'):
-                # Remove numbering if present
-                if '. ' in line:
-                    query = line.split('. ', 1)[1]
-                    queries.append(query)
-                elif line:
-                    queries.append(line)
-
-        return queries
-    except Exception as e:
-        print(f"Error loading queries: {e}")
-        sys.exit(1)
-
 def generate_queries(config: dict) -> str:
     """Generate queries using Copilot."""
     # Check if Copilot is enabled
@@ -78,8 +57,10 @@ def generate_queries(config: dict) -> str:
     endpoint = os.getenv('COPILOT_ENDPOINT')
 
     # Initialize Copilot handler
+    from utils.handler_cache import get_handler
     try:
-        handler = CopilotHandler(
+        handler = get_handler(
+            'copilot',
             api_key=api_key,
             model=config.get('copilot_model', 'gpt-4'),
             temperature=config.get('temperature', 0.7),
@@ -92,7 +73,7 @@ def generate_queries(config: dict) -> str:
         return None
 
     # Load prompt template
-    template_path = os.path.join(os.path.dirname(__file__), '..', 'prompts', 'query_generation_prompt.txt')
+    template_path = PROMPTS_DIR / 'query_generation_prompt.txt'
     prompt_template = load_prompt_template(template_path)
 
     # Generate queries
@@ -128,7 +109,12 @@ def collect_responses(config: dict, queries_path: str, test_run_id: str = None)
     endpoint = os.getenv('COPILOT_ENDPOINT')
 
     # Load queries
-    queries = load_queries(queries_path)
+    from utils.text_parser import load_queries
+    try:
+        queries = load_queries(queries_path)
+    except Exception as e:
+        print(f"Error loading queries: {e}")
+        sys.exit(1)
     if not queries:
         print("No queries found to process")
         return None
@@ -136,8 +122,10 @@ def collect_responses(config: dict, queries_path: str, test_run_id: str = None)
     print(f"Processing {len(queries)} queries with Copilot...")
 
     # Initialize Copilot handler
+    from utils.handler_cache import get_handler
     try:
-        handler = CopilotHandler(
+        handler = get_handler(
+            'copilot',
             api_key=api_key,
             model=config.get('copilot_model', 'gpt-4'),
             temperature=config.get('temperature', 0.7),
@@ -180,7 +168,8 @@ def collect_responses(config: dict, queries_path: str, test_run_id: str = None)
     # Write CSV
     try:
         import csv
-        with open(output_path, 'w', newline='', encoding='utf-8') as f:
+        # Large buffer so long response rows are flushed in few write() calls
+        with open(output_path, 'w', newline='', encoding='utf-8', buffering=1 << 20) as f:
             writer = csv.writer(f)
             writer.writerow(['Query ID', 'Query Text', 'Provider', 'Response Text'])
 
@@ -208,6 +197,8 @@ def main():
 
     args = parser.parse_args()
 
+    logging.basicConfig(level=logging.INFO)
+
     # Load configuration
     config = load_config(args.config)
 
@@ -220,6 +211,7 @@ def main():
             sys.exit(1)
 
         # Parse and save queries
+        from utils.text_parser import TextParser
         parser = TextParser()
         queries = parser.parse_queries_from_response(queries_response)
 
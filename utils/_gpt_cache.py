@@ -0,0 +1,44 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+# One JSON file per cached call: .cache/<namespace>/<sha256>.json at the project root
+CACHE_ROOT = Path(__file__).resolve().parent.parent / '.cache'
+
+def make_key(*parts: str) -> str:
+    """Return the SHA-256 cache key for the given call inputs (e.g. model and prompt)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def get(key: str, namespace: str = 'gpt', max_age: Optional[float] = None) -> Optional[Any]:
+    """Return the cached value for key, or None if it is missing or older than max_age seconds."""
+    path = CACHE_ROOT / namespace / f'{key}.json'
+    try:
+        if max_age is not None and time.time() - path.stat().st_mtime > max_age:
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def put(key: str, value: Any, namespace: str = 'gpt'):
+    """Store value under key; written to a temp file first so readers never see a partial entry."""
+    cache_dir = CACHE_ROOT / namespace
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_dir / f'{key}.json')
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
@@ -0,0 +1,35 @@
+from typing import Optional
+
+QUERY_SYSTEM_MESSAGE = "You are an expert at generating realistic search queries for business visibility testing. Create diverse, natural queries that real users would ask."
+
+# Fallback query-generation prompt, used when no template file is supplied
+FALLBACK_QUERY_PROMPT = """Generate {total_queries} realistic search queries to test AI visibility for {business_name} ({business_url}){location_clause}.
+
+Create exactly {num_consumer} consumer-focused queries and {num_business} business-focused queries.
+
+CONSUMER QUERIES ({num_consumer}):
+- Questions a customer might ask when they have a problem that {business_name} could solve
+- Should NOT mention {business_name} directly
+- Should be natural, conversational questions
+- Examples: "My car suspension is bouncing on rough roads", "Where can I get quality suspension upgrades?"
+
+BUSINESS QUERIES ({num_business}):
+- Questions someone might ask when specifically researching {business_name}
+- Can mention the business name or ask for comparisons
+- Examples: "What do people think about {business_name}?", "Is {business_name} better than competitors?"
+
+Format your response as a numbered list with exactly {total_queries} queries total.
+Make sure each query is self-contained and doesn't require additional context."""
+
+def build_query_prompt(business_name: str, business_url: str, business_location: Optional[str], num_consumer: int, num_business: int,
+                       prompt_template: Optional[str] = None) -> str:
+    """Fill prompt_template (or the fallback prompt) for a query-generation request."""
+    return (prompt_template or FALLBACK_QUERY_PROMPT).format(
+        total_queries=num_consumer + num_business,
+        business_name=business_name,
+        business_url=business_url,
+        business_location=business_location or '',
+        location_clause=f" operating in {business_location}" if business_location else '',
+        num_consumer=num_consumer,
+        num_business=num_business
+    )
@@ -0,0 +1,66 @@
+import random
+import time
+import asyncio
+import logging
+import threading
+from typing import Awaitable, Callable, Optional, Tuple, Type, TypeVar
+
+T = TypeVar('T')
+
+# Upper bound on a computed (non Retry-After) backoff delay, in seconds
+MAX_BACKOFF = 60.0
+
+logger = logging.getLogger(__name__)
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    """Return the server's Retry-After delay in seconds, if the error carries one."""
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    if not headers:
+        return None
+    try:
+        return max(0.0, float(headers.get('retry-after')))
+    except (TypeError, ValueError):
+        return None
+
+def _backoff_delay(error: BaseException, attempt: int, attempts: int, base: float) -> float:
+    """Return how long to wait before the next attempt, preferring the server's Retry-After."""
+    delay = _retry_after(error)
+    if delay is None:
+        # Full jitter: concurrent workers spread out instead of retrying in lockstep
+        delay = random.uniform(0, min(MAX_BACKOFF, base * 2 ** (attempt + 1)))
+    else:
+        delay += random.uniform(0, base)
+    logger.warning("Transient error (%s), retrying in %.1fs (attempt %d/%d)",
+                   type(error).__name__, delay, attempt + 1, attempts)
+    return delay
+
+def with_retry(fn: Callable[[], T], retry_on: Tuple[Type[BaseException], ...], attempts: int = 5, base: float = 1.0,
+               cancel: Optional[threading.Event] = None) -> T:
+    """Call fn, retrying transient errors with exponential backoff with full jitter (up to 2*base, 4*base, ... capped at MAX_BACKOFF).
+
+    Setting cancel cuts a pending wait short and re-raises the last error instead of retrying.
+    """
+    for attempt in range(attempts):
+        try:
+            return fn()
+        except retry_on as e:
+            if attempt == attempts - 1 or (cancel is not None and cancel.is_set()):
+                raise
+            delay = _backoff_delay(e, attempt, attempts, base)
+            if cancel is None:
+                time.sleep(delay)
+            elif cancel.wait(delay):
+                raise
+
+async def with_retry_async(fn: Callable[[], Awaitable[T]], retry_on: Tuple[Type[BaseException], ...], attempts: int = 5, base: float = 1.0,
+                           cancel: Optional[threading.Event] = None) -> T:
+    """Async variant of with_retry; fn is called again for every attempt to get a fresh awaitable."""
+    for attempt in range(attempts):
+        try:
+            return await fn()
+        except retry_on as e:
+            if attempt == attempts - 1 or (cancel is not None and cancel.is_set()):
+                raise
+            await asyncio.sleep(_backoff_delay(e, attempt, attempts, base))
+            if cancel is not None and cancel.is_set():
+                raise
@@ -1,11 +1,15 @@
 import requests
+import httpx
+import asyncio
 import time
 import json
 from typing import Optional, Dict, Any, List
+from collections import deque
 import logging
-from concurrent.futures import ThreadPoolExecutor
 import threading
 
+ASSISTANT_SYSTEM_MESSAGE = "You are a helpful AI assistant. Answer the user's question naturally and helpfully. If relevant businesses come to mind, mention them."
+
 class PerplexityHandler:
     def __init__(self, api_key: str, model: str = "llama-3.1-sonar-large-128k-online", temperature: float = 0.7, max_tokens: int = 4000):
         self.api_key = api_key
@@ -16,75 +20,130 @@ class PerplexityHandler:
         self.max_concurrent = 2  # Conservative concurrent requests
         self.base_url = "https://api.pplx.ai/v1/chat/completions"
 
-        logging.basicConfig(level=logging.INFO)
+        # Static request parts, built once and reused for every call
+        self._headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+            "User-Agent": "AI-Visibility-Tester/1.0"
+        }
+        self._payload_base = {
+            "model": model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": False
+        }
+
+        # One pooled session so sync calls reuse keep-alive connections instead of a new TLS handshake each time
+        self.session = requests.Session()
+        self.session.headers.update(self._headers)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=0)
+        self.session.mount("https://", adapter)
+
         self.logger = logging.getLogger(__name__)
         self._lock = threading.Lock()
 
+        # Sliding one-second window of request start times; only blocks once it is full
+        self.requests_per_second = max(1, round(1 / self.rate_limit_delay))
+        self._bucket = deque(maxlen=self.requests_per_second)
+
+    def _reserve_slot(self) -> float:
+        """Reserve a request slot and return how long the caller must wait before sending."""
+        with self._lock:
+            now = time.monotonic()
+            wait = 0.0
+            if len(self._bucket) == self._bucket.maxlen:
+                wait = max(0.0, 1.0 - (now - self._bucket[0]))
+            self._bucket.append(now + wait)
+            return wait
+
+    def _throttle(self):
+        """Block only when the per-second request budget is used up."""
+        wait = self._reserve_slot()
+        if wait > 0:
+            time.sleep(wait)
+
+    def _build_payload(self, prompt: str, system_message: Optional[str] = None) -> Dict[str, Any]:
+        """Build the chat completion payload for a single prompt."""
+        return {
+            **self._payload_base,
+            "messages": ([{"role": "system", "content": system_message}] if system_message else []) +
+                        [{"role": "user", "content": prompt}]
+        }
+
+    def _parse_response(self, response) -> Optional[str]:
+        """Extract the completion text from a requests/httpx response, logging failures."""
+        if response.status_code == 200:
+            result = response.json()
+            if 'choices' in result and len(result['choices']) > 0:
+                return result['choices'][0]['message']['content']
+            else:
+                self.logger.error("Unexpected response format: %s", result)
+                return None
+        elif response.status_code == 401:
+            self.logger.error("Authentication failed. Please check your Perplexity API key.")
+            return None
+        else:
+            self.logger.error("Perplexity API error: %s", response.status_code)
+            try:
+                error_data = response.json()
+                self.logger.error("Error details: %s", error_data)
+            except:
+                self.logger.error("Error response: %s", response.text[:500])
+            return None
+
     def generate_response(self, prompt: str, system_message: Optional[str] = None) -> Optional[str]:
         """Generate a response from Perplexity API with rate limiting and error handling."""
         try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-                "User-Agent": "AI-Visibility-Tester/1.0"
-            }
+            payload = self._build_payload(prompt, system_message)
 
-            messages = []
-            if system_message:
-                messages.append({"role": "system", "content": system_message})
-            messages.append({"role": "user", "content": prompt})
-
-            payload = {
-                "model": self.model,
-                "messages": messages,
-                "temperature": self.temperature,
-                "max_tokens": self.max_tokens,
-                "stream": False
-            }
-
-            self.logger.info(f"Making request to {self.base_url} with model {self.model}")
+            self.logger.info("Making request to %s with model %s", self.base_url, self.model)
 
-            response = requests.post(
+            self._throttle()
+            response = self.session.post(
                 self.base_url,
-                headers=headers,
                 json=payload,
                 timeout=60
             )
 
-            # Rate limiting
-            time.sleep(self.rate_limit_delay)
+            self.logger.info("Response status: %s", response.status_code)
 
-            self.logger.info(f"Response status: {response.status_code}")
-
-            if response.status_code == 200:
-                result = response.json()
-                if 'choices' in result and len(result['choices']) > 0:
-                    return result['choices'][0]['message']['content']
-                else:
-                    self.logger.error(f"Unexpected response format: {result}")
-                    return None
-            elif response.status_code == 401:
-                self.logger.error("Authentication failed. Please check your Perplexity API key.")
-                return None
-            elif response.status_code == 429:
+            if response.status_code == 429:
                 self.logger.warning("Rate limit exceeded. Waiting 60 seconds...")
                 time.sleep(60)
                 return self.generate_response(prompt, system_message)
-            else:
-                self.logger.error(f"Perplexity API error: {response.status_code}")
-                try:
-                    error_data = response.json()
-                    self.logger.error(f"Error details: {error_data}")
-                except:
-                    self.logger.error(f"Error response: {response.text[:500]}")
-                return None
+
+            return self._parse_response(response)
 
         except requests.exceptions.RequestException as e:
-            self.logger.error(f"Request error: {e}")
+            self.logger.error("Request error: %s", e)
             return None
         except Exception as e:
-            self.logger.error(f"Unexpected error: {e}")
+            self.logger.error("Unexpected error: %s", e)
+            return None
+
+    async def generate_response_async(self, client: httpx.AsyncClient, prompt: str, system_message: Optional[str] = None) -> Optional[str]:
+        """Generate a response over a shared async HTTP/2 client."""
+        try:
+            payload = self._build_payload(prompt, system_message)
+
+            while True:
+                await asyncio.sleep(self._reserve_slot())
+                response = await client.post(self.base_url, json=payload)
+
+                self.logger.info("Response status: %s", response.status_code)
+
+                if response.status_code != 429:
+                    return self._parse_response(response)
+
+                self.logger.warning("Rate limit exceeded. Waiting 60 seconds...")
+                await asyncio.sleep(60)
+
+        except httpx.HTTPError as e:
+            self.logger.error("Request error: %s", e)
+            return None
+        except Exception as e:
+            self.logger.error("Unexpected error: %s", e)
             return None
 
     def generate_queries(self, business_name: str, business_url: str, num_consumer: int, num_business: int, prompt_template: str = None) -> Optional[str]:
@@ -124,37 +183,30 @@ Make sure each query is self-contained and doesn't require additional context.""
 
     def get_ai_response(self, query: str) -> Optional[str]:
         """Get AI response to a query as if the user was asking for help."""
-        system_message = "You are a helpful AI assistant. Answer the user's question naturally and helpfully. If relevant businesses come to mind, mention them."
-
-        return self.generate_response(query, system_message)
+        return self.generate_response(query, ASSISTANT_SYSTEM_MESSAGE)
 
     def get_multiple_responses(self, queries: List[str], progress_callback=None) -> List[Dict[str, Any]]:
         """Get AI responses for multiple queries concurrently."""
-        results = []
-
-        def process_query(query_data):
-            idx, query = query_data
-            response = self.get_ai_response(query)
+        return asyncio.run(self._get_multiple_responses_async(queries, progress_callback))
+
+    async def _get_multiple_responses_async(self, queries: List[str], progress_callback=None) -> List[Dict[str, Any]]:
+        """Fan all queries out over one HTTP/2 connection, bounded by max_concurrent."""
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+        completed = 0
+
+        async def process_query(idx: int, query: str) -> Dict[str, Any]:
+            nonlocal completed
+            async with semaphore:
+                response = await self.generate_response_async(client, query, ASSISTANT_SYSTEM_MESSAGE)
+            completed += 1
             if progress_callback:
-                progress_callback(idx + 1, len(queries))
+                progress_callback(completed, len(queries))
             return {
                 'query_id': idx + 1,
                 'query_text': query,
                 'response_text': response or "ERROR: Failed to get response"
             }
 
-        # Process queries in batches to respect rate limits
-        batch_size = self.max_concurrent
-
-        for i in range(0, len(queries), batch_size):
-            batch_queries = list(enumerate(queries[i:i + batch_size], start=i))
-
-            with ThreadPoolExecutor(max_workers=self.max_concurrent) as executor:
-                batch_results = list(executor.map(process_query, batch_queries))
-                results.extend(batch_results)
-
-            # Brief pause between batches to respect rate limits
-            if i + batch_size < len(queries):
-                time.sleep(3)  # Longer delay for Perplexity
-
-        return results
\ No newline at end of file
+        limits = httpx.Limits(max_connections=self.max_concurrent)
+        async with httpx.AsyncClient(http2=True, headers=self._headers, timeout=60, limits=limits) as client:
+            return await asyncio.gather(*(process_query(idx, query) for idx, query in enumerate(queries)))
@@ -0,0 +1,57 @@
+import time
+import threading
+from typing import Optional
+
+class CircuitBreaker:
+    """Fail fast on a provider that keeps failing, and probe it again after a cool-down.
+
+    CLOSED lets every call through. After max_failures consecutive failures the breaker OPENs
+    and rejects calls until half_open_after seconds have passed; then a single probe call is
+    let through (HALF_OPEN). A successful probe closes the breaker, a failed one re-opens it.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, max_failures: int = 3, half_open_after: float = 300.0):
+        self.max_failures = max_failures
+        self.half_open_after = half_open_after
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _cooled_down(self) -> bool:
+        return time.monotonic() - self.opened_at >= self.half_open_after
+
+    @property
+    def available(self) -> bool:
+        """Whether a call would currently be let through (without claiming the probe slot)."""
+        with self._lock:
+            return self.state == self.CLOSED or self._cooled_down()
+
+    def allow(self) -> bool:
+        """Return True if the caller may make a request; the first caller after the cool-down becomes the probe."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            # Also re-arms the probe if the previous one never reported back
+            if self._cooled_down():
+                self.state = self.HALF_OPEN
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.max_failures:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
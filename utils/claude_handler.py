@@ -1,11 +1,18 @@
 import time
 import json
+import asyncio
 import os
 from typing import Optional, Dict, Any, List
+from collections import deque
 import logging
-from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 import threading
 
+from ._retry import with_retry, with_retry_async
+from ._query_prompt import QUERY_SYSTEM_MESSAGE, build_query_prompt
+
+PROMPTS_DIR = Path(__file__).resolve().parent.parent / 'prompts'
+
 # Try using Anthropic library
 try:
     import anthropic
@@ -16,6 +23,9 @@ except ImportError:
 class ClaudeHandler:
     """Handler for Claude API with enhanced business suggestion prompts."""
 
+    # Prompt text keyed by (path, mtime_ns) so handlers share one read until the file changes
+    _prompt_cache: Dict[tuple, str] = {}
+
     def __init__(self, api_key: str, model: str = "claude-3-haiku-20240307", temperature: float = 0.7, max_tokens: int = 4000):
         if not ANTHROPIC_AVAILABLE:
             raise ImportError("Anthropic library required for this handler. Install with: pip install anthropic")
@@ -31,44 +41,77 @@ class ClaudeHandler:
         # Initialize Anthropic client
         self.client = anthropic.Anthropic(api_key=api_key)
 
-        logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
         self._lock = threading.Lock()
+        # Event of the latest generate_queries call; cancel() sets it to stop that call waiting out rate limits
+        self._cancel = threading.Event()
+
+        # Sliding one-second window of request start times; only blocks once it is full
+        self.requests_per_second = max(1, round(1 / self.rate_limit_delay))
+        self._bucket = deque(maxlen=self.requests_per_second)
 
         # Load enhanced prompt
         self.enhanced_prompt = self._load_enhanced_prompt()
 
+    def cancel(self):
+        """Abandon the rate-limit retries of the running generate_queries call, e.g. after another provider already answered.
+
+        Other requests on this handler, including later ones, keep retrying as usual.
+        """
+        self._cancel.set()
+
+    def _reserve_slot(self) -> float:
+        """Reserve a request slot and return how long the caller must wait before sending."""
+        with self._lock:
+            now = time.monotonic()
+            wait = 0.0
+            if len(self._bucket) == self._bucket.maxlen:
+                wait = max(0.0, 1.0 - (now - self._bucket[0]))
+            self._bucket.append(now + wait)
+            return wait
+
+    def _throttle(self):
+        """Block only when the per-second request budget is used up."""
+        wait = self._reserve_slot()
+        if wait > 0:
+            time.sleep(wait)
+
     def _load_enhanced_prompt(self) -> str:
         """Load the enhanced prompt for Claude."""
+        path = PROMPTS_DIR / 'enhanced_claude_prompt.txt'
         try:
-            prompt_path = os.path.join(os.path.dirname(__file__), '..', 'prompts', 'enhanced_claude_prompt.txt')
-            with open(prompt_path, 'r', encoding='utf-8') as f:
-                return f.read().strip()
+            key = (str(path), path.stat().st_mtime_ns)
+            prompt = self._prompt_cache.get(key)
+            if prompt is None:
+                prompt = path.read_text(encoding='utf-8').strip()
+                self._prompt_cache[key] = prompt
+            return prompt
         except Exception as e:
-            self.logger.warning(f"Could not load enhanced prompt: {e}")
+            self.logger.warning("Could not load enhanced prompt: %s", e)
             return "You are a helpful AI assistant. Answer the user's question naturally and helpfully. Please suggest relevant businesses that could help with this query."
 
-    def generate_response(self, prompt: str, system_message: Optional[str] = None) -> Optional[str]:
+    def generate_response(self, prompt: str, system_message: Optional[str] = None, cancel: Optional[threading.Event] = None) -> Optional[str]:
         """Generate a response using Claude API with enhanced business suggestions."""
         try:
             # Use enhanced prompt as system message if none provided
             if not system_message:
                 system_message = self.enhanced_prompt
 
-            self.logger.info(f"Making Claude request with model {self.model}")
+            self.logger.info("Making Claude request with model %s", self.model)
 
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=self.max_tokens,
-                temperature=self.temperature,
-                system=system_message,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
+            def create():
+                self._throttle()
+                return self.client.messages.create(
+                    model=self.model,
+                    max_tokens=self.max_tokens,
+                    temperature=self.temperature,
+                    system=system_message,
+                    messages=[
+                        {"role": "user", "content": prompt}
+                    ]
+                )
 
-            # Rate limiting
-            time.sleep(self.rate_limit_delay)
+            response = with_retry(create, (anthropic.RateLimitError,), cancel=cancel)
 
             return response.content[0].text
 
@@ -76,85 +119,104 @@ class ClaudeHandler:
             self.logger.error("Authentication failed. Please check your Claude API key.")
             return None
         except anthropic.RateLimitError:
-            self.logger.warning("Rate limit exceeded. Waiting 60 seconds...")
-            time.sleep(60)
-            return self.generate_response(prompt, system_message)
+            self.logger.warning("Rate limit still exceeded after retries (or retry cancelled)")
+            return None
         except anthropic.APIError as e:
-            self.logger.error(f"Claude API error: {e}")
+            self.logger.error("Claude API error: %s", e)
             return None
         except Exception as e:
-            self.logger.error(f"Unexpected error: {e}")
+            self.logger.error("Unexpected error: %s", e)
             return None
 
     def generate_queries(self, business_name: str, business_url: str, business_location: str, num_consumer: int, num_business: int, prompt_template: str = None) -> Optional[str]:
         """Generate queries for business visibility testing."""
-        if prompt_template:
-            # Use provided template with variable substitution
-            prompt = prompt_template.format(
-                total_queries=num_consumer + num_business,
-                business_name=business_name,
-                business_url=business_url,
-                business_location=business_location,
-                num_consumer=num_consumer,
-                num_business=num_business
-            )
-        else:
-            # Fallback to simple prompt
-            prompt = f"""Generate {num_consumer + num_business} realistic search queries to test AI visibility for {business_name} ({business_url}) operating in {business_location}.
-
-Create exactly {num_consumer} consumer-focused queries and {num_business} business-focused queries.
-
-CONSUMER QUERIES ({num_consumer}):
-- Questions a customer might ask when they have a problem that {business_name} could solve
-- Should NOT mention {business_name} directly
-- Should be natural, conversational questions
-- Examples: "My car suspension is bouncing on rough roads", "Where can I get quality suspension upgrades?"
-
-BUSINESS QUERIES ({num_business}):
-- Questions someone might ask when specifically researching {business_name}
-- Can mention the business name or ask for comparisons
-- Examples: "What do people think about {business_name}?", "Is {business_name} better than competitors?"
-
-Format your response as a numbered list with exactly {num_consumer + num_business} queries total.
-Make sure each query is self-contained and doesn't require additional context."""
-
-        system_message = "You are an expert at generating realistic search queries for business visibility testing. Create diverse, natural queries that real users would ask."
-
-        return self.generate_response(prompt, system_message)
+        # A fresh event per call, so a cancel() aimed at this call never leaks into later requests
+        self._cancel = cancel = threading.Event()
+        prompt = build_query_prompt(business_name, business_url, business_location, num_consumer, num_business, prompt_template)
+        return self.generate_response(prompt, QUERY_SYSTEM_MESSAGE, cancel=cancel)
 
     def get_ai_response(self, query: str) -> Optional[str]:
         """Get AI response to a query using enhanced prompt for business suggestions."""
         # Use the enhanced prompt that encourages business suggestions
         return self.generate_response(query)
 
-    def get_multiple_responses(self, queries: List[str], progress_callback=None) -> List[Dict[str, Any]]:
-        """Get AI responses for multiple queries with parallel processing."""
-        results = []
+    async def generate_response_async(self, client: "anthropic.AsyncAnthropic", prompt: str, system_message: Optional[str] = None,
+                                      cancel: Optional[threading.Event] = None) -> Optional[str]:
+        """Async counterpart of generate_response using a shared AsyncAnthropic client."""
+        try:
+            # Use enhanced prompt as system message if none provided
+            if not system_message:
+                system_message = self.enhanced_prompt
+
+            self.logger.info("Making Claude request with model %s", self.model)
+
+            async def create():
+                await asyncio.sleep(self._reserve_slot())
+                return await client.messages.create(
+                    model=self.model,
+                    max_tokens=self.max_tokens,
+                    temperature=self.temperature,
+                    system=system_message,
+                    messages=[
+                        {"role": "user", "content": prompt}
+                    ]
+                )
 
-        def process_query(query_data):
-            idx, query = query_data
-            response = self.get_ai_response(query)
+            response = await with_retry_async(create, (anthropic.RateLimitError,), cancel=cancel)
+
+            return response.content[0].text
+
+        except anthropic.AuthenticationError:
+            self.logger.error("Authentication failed. Please check your Claude API key.")
+            return None
+        except anthropic.RateLimitError:
+            self.logger.warning("Rate limit still exceeded after retries (or retry cancelled)")
+            return None
+        except anthropic.APIError as e:
+            self.logger.error("Claude API error: %s", e)
+            return None
+        except Exception as e:
+            self.logger.error("Unexpected error: %s", e)
+            return None
+
+    def get_multiple_responses(self, queries: List[str], progress_callback=None, result_callback=None) -> List[Dict[str, Any]]:
+        """Get AI responses for multiple queries with parallel processing.
+
+        If given, result_callback receives each result in query order as soon as it and all earlier queries are done.
+        """
+        return asyncio.run(self._get_multiple_responses_async(queries, progress_callback, result_callback))
+
+    async def _get_multiple_responses_async(self, queries: List[str], progress_callback=None, result_callback=None) -> List[Dict[str, Any]]:
+        """Run all queries on one event loop, bounded by max_concurrent in-flight requests."""
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+        completed = 0
+        # Results that finished ahead of an earlier query, held until they can be released in order
+        pending = {}
+        next_idx = 0
+
+        async def process_query(idx: int, query: str) -> Dict[str, Any]:
+            nonlocal completed, next_idx
+            async with semaphore:
+                response = await self.generate_response_async(client, query)
+            completed += 1
             if progress_callback:
-                progress_callback(idx + 1, len(queries))
-            return {
+                progress_callback(completed, len(queries))
+            result = {
                 'query_id': idx + 1,
                 'query_text': query,
                 'response_text': response or "ERROR: Failed to get response",
                 'provider': self.provider
             }
-
-        # Process queries in batches to respect rate limits
-        batch_size = self.max_concurrent
-
-        for i in range(0, len(queries), batch_size):
-            batch_queries = list(enumerate(queries[i:i + batch_size], start=i))
-
-            with ThreadPoolExecutor(max_workers=self.max_concurrent) as executor:
-                batch_results = list(executor.map(process_query, batch_queries))
-                results.extend(batch_results)
-
-            # Brief pause between batches
-            if i + batch_size < len(queries):
-                time.sleep(3)  # Longer delay for Claude
-
-        return results
\ No newline at end of file
+            if result_callback:
+                pending[idx] = result
+                while next_idx in pending:
+                    result_callback(pending.pop(next_idx))
+                    next_idx += 1
+            return result
+
+        # The async client's connection pool is bound to this event loop, so it lives for one run
+        client = anthropic.AsyncAnthropic(api_key=self.api_key)
+        try:
+            return await asyncio.gather(*(process_query(idx, query) for idx, query in enumerate(queries)))
+        finally:
+            await client.close()
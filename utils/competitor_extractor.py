@@ -1,34 +1,98 @@
 import re
 import os
 import json
-from typing import List, Dict
-from collections import Counter
+import time
+from types import MappingProxyType
+from typing import List, Dict, Any, Mapping
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import openai
 from openai import OpenAI
 
+# Try using orjson for faster parsing of GPT results
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+from . import _gpt_cache
+from ._retry import with_retry
+
+EXTRACTION_MODEL = "gpt-4o-mini"
+
+_json_loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+
+# OpenAI errors worth retrying; anything else (bad request, auth) fails the batch straight away
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+# Known spellings of common competitors, mapped to one canonical name
+_NORMALIZATIONS: Mapping[str, str] = MappingProxyType({
+    # Dobinsons variations
+    'dobinsons': 'Dobinsons',
+    'dobinsons 4x4': 'Dobinsons',
+    'dobinsons suspension': 'Dobinsons',
+
+    # Old Man Emu variations
+    'old man emu': 'Old Man Emu',
+    'ome': 'Old Man Emu',
+    'old man emu suspension': 'Old Man Emu',
+
+    # Pedders variations
+    'pedders': 'Pedders Suspension',
+    'pedders suspension': 'Pedders Suspension',
+    'pedders suspension & brakes': 'Pedders Suspension',
+
+    # Tough Dog variations
+    'tough dog': 'Tough Dog',
+    'tough dog suspension': 'Tough Dog',
+
+    # Lovells variations
+    'lovells': 'Lovells Suspension',
+    'lovells suspension': 'Lovells Suspension',
+
+    # Bilstein variations
+    'bilstein': 'Bilstein',
+
+    # Fox variations
+    'fox': 'Fox',
+    'fox shocks': 'Fox',
+
+    # Rough Country variations
+    'rough country': 'Rough Country',
+})
+
+# Word count of the longest known spelling; bounds the prefix search in _normalize_competitor_name
+_MAX_SYNONYM_WORDS = max(len(key.split()) for key in _NORMALIZATIONS)
+
+# Recommendation indicators around a competitor mention, '+' positive and '-' negative
+_WORD_POLARITY = {
+    **{word: '+' for word in ('recommend', 'best', 'excellent', 'great', 'top', 'quality',
+                              'reliable', 'trusted', 'popular', 'leading', 'premium')},
+    **{word: '-' for word in ('avoid', 'not recommend', 'poor', 'bad', 'worst', 'inferior')},
+}
+# Longest first so "not recommend" is matched as a whole rather than as "recommend"
+_CONTEXT_RE = re.compile('|'.join(map(re.escape, sorted(_WORD_POLARITY, key=len, reverse=True))))
+
 class CompetitorExtractor:
     """Auto-discover competitors and business names mentioned in AI responses using GPT analysis."""
 
-    def __init__(self, business_name: str, business_aliases: List[str] = None):
+    def __init__(self, business_name: str, business_aliases: List[str] = None, batch_size: int = 15,
+                 max_workers: int = 8, max_rpm: int = 500, cache: bool = True, max_response_chars: int = 8000):
         self.business_name = business_name.lower()
         self.business_aliases = [alias.lower() for alias in (business_aliases or [])]
+        self.batch_size = batch_size  # Responses analyzed per GPT call
+        self.max_workers = max_workers  # Concurrent GPT calls
+        self.max_rpm = max_rpm  # Client-side cap on GPT requests per minute
+        self.cache = cache  # Reuse GPT results stored on disk for identical prompts
+        self.max_response_chars = max_response_chars  # ~2000 tokens; longer responses are trimmed before analysis
         self.openai_client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
 
-    def extract_competitors(self, responses: List[str]) -> dict:
-        """
-        Extract all competitor business names from AI responses using GPT analysis.
-        Returns dict with competitor names and their mention counts.
-        """
-        print("Analyzing responses with GPT to extract competitors...")
+        # Start times of the most recent max_rpm requests
+        self._request_times = deque(maxlen=max_rpm)
 
-        all_competitors = []
-
-        # Analyze each response individually for better accuracy
-        for idx, response_text in enumerate(responses, 1):
-            if not response_text or not response_text.strip():
-                continue
-
-            # Create the analysis prompt for this single response
-            analysis_prompt = f"""Review the following AI response and extract ONLY competitor business/brand/company names that were recommended or mentioned.
+        # Constant part of the analysis prompt; each batch only appends its responses
+        self._analysis_prefix = f"""Review each of the following AI responses and extract ONLY competitor business/brand/company names that were recommended or mentioned.
 
 Target Business (DO NOT include): {self.business_name}
 Aliases to exclude: {', '.join(self.business_aliases) if self.business_aliases else 'None'}
@@ -43,55 +107,56 @@ Rules for extraction:
 - Normalize company names (e.g., "Pedders" and "Pedders Suspension" should be "Pedders Suspension")
 - List each competitor only ONCE per response, even if mentioned multiple times
 
-Output ONLY a JSON array of competitor names found in this response.
-Format: ["Company Name 1", "Company Name 2"]
-If no competitors found, return: []
-
-AI Response to analyze:
+The responses are given as a JSON array of {{"id": <number>, "text": <response>}} objects.
+Output ONLY a JSON object with one entry per response id, listing the competitor names found in that response.
+Format: {{"results": [{{"id": 1, "competitors": ["Company Name 1", "Company Name 2"]}}, {{"id": 2, "competitors": []}}]}}
+If no competitors are found in a response, use an empty list for it.
 
-{response_text}"""
+AI Responses to analyze:
 
-            try:
-                # Call GPT to analyze this single response
-                response = self.openai_client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {"role": "system", "content": "You are a precise business name extraction assistant. Extract only suspension/automotive company/brand names, not products, dealers, or locations. Output valid JSON only."},
-                        {"role": "user", "content": analysis_prompt}
-                    ],
-                    temperature=0.2,
-                    response_format={"type": "json_object"}
-                )
+"""
 
-                result_text = response.choices[0].message.content
-                result_data = json.loads(result_text)
+    def _throttle(self):
+        """Block until another request fits in the rolling one-minute max_rpm window."""
+        if len(self._request_times) == self._request_times.maxlen:
+            wait = 60.0 - (time.monotonic() - self._request_times[0])
+            if wait > 0:
+                time.sleep(wait)
+        self._request_times.append(time.monotonic())
 
-                # Handle both array and object responses
-                if isinstance(result_data, dict):
-                    # If GPT returned {"competitors": [...]} or similar
-                    competitors_in_response = result_data.get('competitors', list(result_data.values())[0] if result_data else [])
-                else:
-                    competitors_in_response = result_data
+    def extract_competitors(self, responses: List[str]) -> dict:
+        """
+        Extract all competitor business names from AI responses using GPT analysis.
+        Returns dict with competitor names and their mention counts.
+        """
+        print("Analyzing responses with GPT to extract competitors...")
 
-                # Add to overall list
-                all_competitors.extend(competitors_in_response)
+        competitor_counts = Counter()
 
-                if idx % 5 == 0:
-                    print(f"  Processed {idx}/{len(responses)} responses...")
+        # Keep 1-based response numbers so GPT results can be matched back to responses
+        items = [
+            {"id": idx, "text": self._truncate(response_text)}
+            for idx, response_text in enumerate(responses, 1)
+            if response_text and response_text.strip()
+        ]
 
-            except Exception as e:
-                print(f"  Error analyzing response {idx}: {e}")
-                continue
+        batches = [items[start:start + self.batch_size] for start in range(0, len(items), self.batch_size)]
 
-        # Normalize competitor names before counting
-        normalized_competitors = []
-        for comp in all_competitors:
-            normalized = self._normalize_competitor_name(comp)
-            if normalized:
-                normalized_competitors.append(normalized)
+        # Analyze batches concurrently; the instructions are sent once per batch, not once per response
+        processed = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {}
+            for batch in batches:
+                self._throttle()
+                futures[executor.submit(self._extract_batch, batch)] = batch
 
-        # Count occurrences
-        competitor_counts = Counter(normalized_competitors)
+            for future in as_completed(futures):
+                # Normalize competitor names as results arrive and count them directly
+                competitor_counts.update(
+                    normalized for normalized in map(self._normalize_competitor_name, future.result()) if normalized
+                )
+                processed += len(futures[future])
+                print(f"  Processed {processed}/{len(items)} responses...")
 
         # Filter out the target business if it slipped through
         filtered = {
@@ -102,54 +167,74 @@ AI Response to analyze:
         print(f"GPT extracted {len(filtered)} unique competitors from {len(responses)} responses")
         return dict(sorted(filtered.items(), key=lambda x: x[1], reverse=True))
 
-    def _normalize_competitor_name(self, name: str) -> str:
-        """Normalize competitor names to handle common variations."""
-        if not name:
-            return ""
-
-        name_lower = name.lower().strip()
-
-        # Common normalization patterns
-        normalizations = {
-            # Dobinsons variations
-            'dobinsons': 'Dobinsons',
-            'dobinsons 4x4': 'Dobinsons',
-            'dobinsons suspension': 'Dobinsons',
-
-            # Old Man Emu variations
-            'old man emu': 'Old Man Emu',
-            'ome': 'Old Man Emu',
-            'old man emu suspension': 'Old Man Emu',
-
-            # Pedders variations
-            'pedders': 'Pedders Suspension',
-            'pedders suspension': 'Pedders Suspension',
-            'pedders suspension & brakes': 'Pedders Suspension',
+    def _truncate(self, response_text: str) -> str:
+        """Keep the head and tail of an over-long response so prompt size stays bounded."""
+        if len(response_text) <= self.max_response_chars:
+            return response_text
+        half = self.max_response_chars // 2
+        return response_text[:half] + ' ... ' + response_text[-half:]
+
+    def _extract_batch(self, batch: List[Dict[str, Any]]) -> List[str]:
+        """Ask GPT for the competitors mentioned in one batch of responses."""
+        # Only the responses vary between batches; the instructions are built once in __init__
+        analysis_prompt = self._analysis_prefix + json.dumps(batch, ensure_ascii=False)
+
+        try:
+            cache_key = _gpt_cache.make_key(EXTRACTION_MODEL, analysis_prompt)
+            cached = _gpt_cache.get(cache_key) if self.cache else None
+            result_text = cached
+
+            if result_text is None:
+                # Call GPT to analyze this batch of responses, backing off on rate limits and server errors
+                response = with_retry(
+                    lambda: self.openai_client.chat.completions.create(
+                        model=EXTRACTION_MODEL,
+                        messages=[
+                            {"role": "system", "content": "You are a precise business name extraction assistant. Extract only suspension/automotive company/brand names, not products, dealers, or locations. Output valid JSON only."},
+                            {"role": "user", "content": analysis_prompt}
+                        ],
+                        temperature=0.2,
+                        response_format={"type": "json_object"}
+                    ),
+                    retry_on=RETRYABLE_ERRORS
+                )
+                result_text = response.choices[0].message.content
 
-            # Tough Dog variations
-            'tough dog': 'Tough Dog',
-            'tough dog suspension': 'Tough Dog',
+            result_data = _json_loads(result_text)
+            if self.cache and cached is None:
+                _gpt_cache.put(cache_key, result_text)
 
-            # Lovells variations
-            'lovells': 'Lovells Suspension',
-            'lovells suspension': 'Lovells Suspension',
+            # Handle both array and object responses
+            if isinstance(result_data, dict):
+                # If GPT put the entries under a key other than "results", take the first value
+                entries = result_data.get('results') or next(iter(result_data.values()), [])
+            else:
+                entries = result_data
 
-            # Bilstein variations
-            'bilstein': 'Bilstein',
+            # Collect the competitors listed for every response in the batch
+            competitors = []
+            for entry in entries if isinstance(entries, list) else []:
+                if isinstance(entry, dict):
+                    competitors.extend(entry.get('competitors') or [])
+            return competitors
 
-            # Fox variations
-            'fox': 'Fox',
-            'fox shocks': 'Fox',
+        except Exception as e:
+            print(f"  Error analyzing responses {batch[0]['id']}-{batch[-1]['id']}: {e}")
+            return []
 
-            # Rough Country variations
-            'rough country': 'Rough Country',
-        }
+    def _normalize_competitor_name(self, name: str) -> str:
+        """Normalize competitor names to handle common variations."""
+        if not name:
+            return ""
 
-        # Check for exact match
-        if name_lower in normalizations:
-            return normalizations[name_lower]
+        # Longest known spelling the name starts with, so "Pedders Suspension & Brakes Parts"
+        # still maps to "Pedders Suspension"; else the original name
+        words = name.lower().split()
+        for length in range(min(len(words), _MAX_SYNONYM_WORDS), 0, -1):
+            canonical = _NORMALIZATIONS.get(' '.join(words[:length]))
+            if canonical:
+                return canonical
 
-        # If no match found, return the original name with title case
         return name.strip()
 
     def _fallback_extraction(self, responses: List[str]) -> dict:
@@ -187,19 +272,10 @@ AI Response to analyze:
         end = min(len(text), pos + len(competitor) + 100)
         context = text[start:end]
 
-        # Determine sentiment/recommendation level
-        positive_indicators = [
-            'recommend', 'best', 'excellent', 'great', 'top', 'quality',
-            'reliable', 'trusted', 'popular', 'leading', 'premium'
-        ]
-
-        negative_indicators = [
-            'avoid', 'not recommend', 'poor', 'bad', 'worst', 'inferior'
-        ]
-
-        context_lower = context.lower()
-        positive_count = sum(1 for word in positive_indicators if word in context_lower)
-        negative_count = sum(1 for word in negative_indicators if word in context_lower)
+        # Determine sentiment/recommendation level from the distinct indicator words in one scan
+        hits = set(_CONTEXT_RE.findall(context.lower()))
+        positive_count = sum(1 for word in hits if _WORD_POLARITY[word] == '+')
+        negative_count = len(hits) - positive_count
 
         if positive_count > negative_count:
             sentiment = 'positive'
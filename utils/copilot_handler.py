@@ -3,9 +3,22 @@ import json
 import os
 from typing import Optional, Dict, Any, List
 import logging
+import functools
+from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor
 import threading
 
+from .rate_limit import TokenBucket
+from ._query_prompt import QUERY_SYSTEM_MESSAGE, build_query_prompt
+from ._retry import with_retry
+
+PROMPTS_DIR = Path(__file__).resolve().parent.parent / 'prompts'
+
+@functools.lru_cache(maxsize=1)
+def _read_enhanced_prompt() -> str:
+    """Cached read of the Copilot system prompt."""
+    return (PROMPTS_DIR / 'enhanced_copilot_prompt.txt').read_text(encoding='utf-8').strip()
+
 # Try using OpenAI library for Azure/Copilot
 try:
     import openai
@@ -21,9 +34,10 @@ class CopilotHandler:
             raise ImportError("OpenAI library required for this handler. Install with: pip install openai")
 
         # Initialize logger FIRST
-        logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
         self._lock = threading.Lock()
+        # Event of the latest generate_queries call; cancel() sets it to stop that call waiting out rate limits
+        self._cancel = threading.Event()
 
         self.api_key = api_key
         self.model = model
@@ -31,6 +45,10 @@ class CopilotHandler:
         self.max_tokens = max_tokens
         self.rate_limit_delay = 0.5
         self.max_concurrent = 3
+        # Paces request starts across worker threads instead of sleeping after every call
+        self._bucket = TokenBucket(rate=1 / self.rate_limit_delay, burst=self.max_concurrent)
+        # Worker threads reused by every get_multiple_responses call; see close()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="copilot")
         self.provider = "copilot"
 
         # Initialize OpenAI client for Azure/Copilot
@@ -51,23 +69,37 @@ class CopilotHandler:
                 )
 
         except Exception as e:
-            self.logger.error(f"Failed to initialize Copilot client: {e}")
+            self.logger.error("Failed to initialize Copilot client: %s", e)
             raise
 
         # Load enhanced prompt
         self.enhanced_prompt = self._load_enhanced_prompt()
 
+    def cancel(self):
+        """Abandon the rate-limit retries of the running generate_queries call, e.g. after another provider already answered.
+
+        Other requests on this handler, including later ones, keep retrying as usual.
+        """
+        self._cancel.set()
+
+    def close(self):
+        """Shut down the shared worker pool."""
+        self._executor.shutdown(wait=False)
+
+    def __del__(self):
+        # __init__ may have raised before the pool existed
+        if getattr(self, '_executor', None) is not None:
+            self.close()
+
     def _load_enhanced_prompt(self) -> str:
         """Load the enhanced prompt for Copilot."""
         try:
-            prompt_path = os.path.join(os.path.dirname(__file__), '..', 'prompts', 'enhanced_copilot_prompt.txt')
-            with open(prompt_path, 'r', encoding='utf-8') as f:
-                return f.read().strip()
+            return _read_enhanced_prompt()
         except Exception as e:
-            self.logger.warning(f"Could not load enhanced prompt: {e}")
+            self.logger.warning("Could not load enhanced prompt: %s", e)
             return "You are a helpful AI assistant. Answer the user's question naturally and helpfully. Please suggest relevant businesses that could help with this query."
 
-    def generate_response(self, prompt: str, system_message: Optional[str] = None) -> Optional[str]:
+    def generate_response(self, prompt: str, system_message: Optional[str] = None, cancel: Optional[threading.Event] = None) -> Optional[str]:
         """Generate a response using Copilot API with enhanced business suggestions."""
         try:
             messages = []
@@ -80,17 +112,18 @@ class CopilotHandler:
 
             messages.append({"role": "user", "content": prompt})
 
-            self.logger.info(f"Making Copilot request with model {self.model}")
+            self.logger.info("Making Copilot request with model %s", self.model)
 
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=self.temperature,
-                max_tokens=self.max_tokens
-            )
+            def create():
+                self._bucket.acquire()
+                return self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens
+                )
 
-            # Rate limiting
-            time.sleep(self.rate_limit_delay)
+            response = with_retry(create, (openai.RateLimitError,), cancel=cancel)
 
             return response.choices[0].message.content
 
@@ -98,51 +131,21 @@ class CopilotHandler:
             self.logger.error("Authentication failed. Please check your Copilot API key.")
             return None
         except openai.RateLimitError:
-            self.logger.warning("Rate limit exceeded. Waiting 60 seconds...")
-            time.sleep(60)
-            return self.generate_response(prompt, system_message)
+            self.logger.warning("Rate limit still exceeded after retries (or retry cancelled)")
+            return None
         except openai.APIError as e:
-            self.logger.error(f"Copilot API error: {e}")
+            self.logger.error("Copilot API error: %s", e)
             return None
         except Exception as e:
-            self.logger.error(f"Unexpected error: {e}")
+            self.logger.error("Unexpected error: %s", e)
             return None
 
     def generate_queries(self, business_name: str, business_url: str, business_location: str, num_consumer: int, num_business: int, prompt_template: str = None) -> Optional[str]:
         """Generate queries for business visibility testing."""
-        if prompt_template:
-            # Use provided template with variable substitution
-            prompt = prompt_template.format(
-                total_queries=num_consumer + num_business,
-                business_name=business_name,
-                business_url=business_url,
-                business_location=business_location,
-                num_consumer=num_consumer,
-                num_business=num_business
-            )
-        else:
-            # Fallback to simple prompt
-            prompt = f"""Generate {num_consumer + num_business} realistic search queries to test AI visibility for {business_name} ({business_url}) operating in {business_location}.
-
-Create exactly {num_consumer} consumer-focused queries and {num_business} business-focused queries.
-
-CONSUMER QUERIES ({num_consumer}):
-- Questions a customer might ask when they have a problem that {business_name} could solve
-- Should NOT mention {business_name} directly
-- Should be natural, conversational questions
-- Examples: "My car suspension is bouncing on rough roads", "Where can I get quality suspension upgrades?"
-
-BUSINESS QUERIES ({num_business}):
-- Questions someone might ask when specifically researching {business_name}
-- Can mention the business name or ask for comparisons
-- Examples: "What do people think about {business_name}?", "Is {business_name} better than competitors?"
-
-Format your response as a numbered list with exactly {num_consumer + num_business} queries total.
-Make sure each query is self-contained and doesn't require additional context."""
-
-        system_message = "You are an expert at generating realistic search queries for business visibility testing. Create diverse, natural queries that real users would ask."
-
-        return self.generate_response(prompt, system_message)
+        # A fresh event per call, so a cancel() aimed at this call never leaks into later requests
+        self._cancel = cancel = threading.Event()
+        prompt = build_query_prompt(business_name, business_url, business_location, num_consumer, num_business, prompt_template)
+        return self.generate_response(prompt, QUERY_SYSTEM_MESSAGE, cancel=cancel)
 
     def get_ai_response(self, query: str) -> Optional[str]:
         """Get AI response to a query using enhanced prompt for business suggestions."""
@@ -165,18 +168,7 @@ Make sure each query is self-contained and doesn't require additional context.""
                 'provider': self.provider
             }
 
-        # Process queries in batches to respect rate limits
-        batch_size = self.max_concurrent
-
-        for i in range(0, len(queries), batch_size):
-            batch_queries = list(enumerate(queries[i:i + batch_size], start=i))
-
-            with ThreadPoolExecutor(max_workers=self.max_concurrent) as executor:
-                batch_results = list(executor.map(process_query, batch_queries))
-                results.extend(batch_results)
-
-            # Brief pause between batches
-            if i + batch_size < len(queries):
-                time.sleep(2)
+        # Shared pool for the whole list; the token bucket in generate_response does the pacing
+        results.extend(self._executor.map(process_query, enumerate(queries)))
 
         return results
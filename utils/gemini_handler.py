@@ -1,15 +1,33 @@
 import time
 import json
+import asyncio
 import os
 from typing import Optional, Dict, Any, List
 import logging
-from concurrent.futures import ThreadPoolExecutor
+import functools
+from pathlib import Path
 import threading
 
+from ._retry import with_retry, with_retry_async
+from .rate_limit import TokenBucket
+from ._query_prompt import QUERY_SYSTEM_MESSAGE, build_query_prompt
+
+PROMPTS_DIR = Path(__file__).resolve().parent.parent / 'prompts'
+
+@functools.lru_cache(maxsize=1)
+def _read_enhanced_prompt() -> str:
+    """Return the enhanced Gemini prompt, read from disk on first use only."""
+    return (PROMPTS_DIR / 'enhanced_gemini_prompt.txt').read_text(encoding='utf-8').strip()
+
 # Try using Google Generative AI library
 try:
     import google.generativeai as genai
+    from google.api_core import exceptions as google_exceptions
     GEMINI_AVAILABLE = True
+
+    # Quota exhaustion and transient server errors are retried with backoff
+    RETRYABLE_ERRORS = (google_exceptions.ResourceExhausted, google_exceptions.ServiceUnavailable,
+                        google_exceptions.InternalServerError)
 except ImportError:
     GEMINI_AVAILABLE = False
 
@@ -21,7 +39,6 @@ class GeminiHandler:
             raise ImportError("Google Generative AI library required for this handler. Install with: pip install google-generativeai")
 
         # Initialize logger FIRST
-        logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
         self._lock = threading.Lock()
 
@@ -29,10 +46,13 @@ class GeminiHandler:
         self.model = model
         self.temperature = temperature
         self.max_tokens = max_tokens
-        self.rate_limit_delay = 1.0  # Gemini has rate limits
+        self.max_rpm = 60  # Gemini has rate limits
         self.max_concurrent = 2  # Conservative concurrent requests
         self.provider = "gemini"
 
+        # Only sleeps once the per-minute request budget is used up
+        self._bucket = TokenBucket(rate=self.max_rpm / 60, burst=self.max_rpm)
+
         # Configure Gemini
         genai.configure(api_key=api_key)
 
@@ -46,9 +66,9 @@ class GeminiHandler:
                 model_name=model,
                 generation_config=generation_config
             )
-            self.logger.info(f"Initialized Gemini model: {model}")
+            self.logger.info("Initialized Gemini model: %s", model)
         except Exception as e:
-            self.logger.error(f"Failed to initialize Gemini model: {e}")
+            self.logger.error("Failed to initialize Gemini model: %s", e)
             raise
 
         # Load enhanced prompt
@@ -57,105 +77,96 @@ class GeminiHandler:
     def _load_enhanced_prompt(self) -> str:
         """Load the enhanced prompt for Gemini."""
         try:
-            prompt_path = os.path.join(os.path.dirname(__file__), '..', 'prompts', 'enhanced_gemini_prompt.txt')
-            with open(prompt_path, 'r', encoding='utf-8') as f:
-                return f.read().strip()
+            return _read_enhanced_prompt()
         except Exception as e:
-            self.logger.warning(f"Could not load enhanced prompt: {e}")
+            self.logger.warning("Could not load enhanced prompt: %s", e)
             return "You are a helpful AI assistant. Answer the user's question naturally and helpfully. Please suggest relevant businesses that could help with this query."
 
+    def _build_prompt(self, prompt: str, system_message: Optional[str] = None) -> str:
+        """Gemini doesn't have a separate system message, so prepend it to the prompt."""
+        if system_message:
+            return f"{system_message}\n\n{prompt}"
+        if self.enhanced_prompt:
+            return f"{self.enhanced_prompt}\n\n{prompt}"
+        return prompt
+
     def generate_response(self, prompt: str, system_message: Optional[str] = None) -> Optional[str]:
         """Generate a response using Gemini API with enhanced business suggestions."""
         try:
-            # Gemini doesn't have a separate system message, so prepend it to the prompt
-            full_prompt = prompt
-            if system_message:
-                full_prompt = f"{system_message}\n\n{prompt}"
-            elif self.enhanced_prompt:
-                full_prompt = f"{self.enhanced_prompt}\n\n{prompt}"
-
-            self.logger.info(f"Making Gemini request with model {self.model}")
+            full_prompt = self._build_prompt(prompt, system_message)
 
-            response = self.client.generate_content(full_prompt)
+            self._bucket.acquire()
+            self.logger.info("Making Gemini request with model %s", self.model)
 
-            # Rate limiting
-            time.sleep(self.rate_limit_delay)
+            # Back off and retry on quota exhaustion and transient server errors
+            response = with_retry(lambda: self.client.generate_content(full_prompt), retry_on=RETRYABLE_ERRORS)
 
             return response.text
 
         except Exception as e:
-            self.logger.error(f"Gemini API error: {e}")
+            self.logger.error("Gemini API error: %s", e)
             return None
 
     def generate_queries(self, business_name: str, business_url: str, business_location: str, num_consumer: int, num_business: int, prompt_template: str = None) -> Optional[str]:
         """Generate queries for business visibility testing."""
-        if prompt_template:
-            # Use provided template with variable substitution
-            prompt = prompt_template.format(
-                total_queries=num_consumer + num_business,
-                business_name=business_name,
-                business_url=business_url,
-                business_location=business_location,
-                num_consumer=num_consumer,
-                num_business=num_business
-            )
-        else:
-            # Fallback to simple prompt
-            prompt = f"""Generate {num_consumer + num_business} realistic search queries to test AI visibility for {business_name} ({business_url}) operating in {business_location}.
+        prompt = build_query_prompt(business_name, business_url, business_location, num_consumer, num_business, prompt_template)
+        return self.generate_response(prompt, QUERY_SYSTEM_MESSAGE)
+
+    def get_ai_response(self, query: str) -> Optional[str]:
+        """Get AI response to a query using enhanced prompt for business suggestions."""
+        # Use the enhanced prompt that encourages business suggestions
+        return self.generate_response(query)
 
-Create exactly {num_consumer} consumer-focused queries and {num_business} business-focused queries.
+    async def generate_response_async(self, prompt: str, system_message: Optional[str] = None) -> Optional[str]:
+        """Async variant of generate_response used for concurrent response collection."""
+        try:
+            full_prompt = self._build_prompt(prompt, system_message)
 
-CONSUMER QUERIES ({num_consumer}):
-- Questions a customer might ask when they have a problem that {business_name} could solve
-- Should NOT mention {business_name} directly
-- Should be natural, conversational questions
-- Examples: "My car suspension is bouncing on rough roads", "Where can I get quality suspension upgrades?"
+            await self._bucket.acquire_async()
+            self.logger.info("Making Gemini request with model %s", self.model)
 
-BUSINESS QUERIES ({num_business}):
-- Questions someone might ask when specifically researching {business_name}
-- Can mention the business name or ask for comparisons
-- Examples: "What do people think about {business_name}?", "Is {business_name} better than competitors?"
+            response = await with_retry_async(lambda: self.client.generate_content_async(full_prompt),
+                                              retry_on=RETRYABLE_ERRORS)
+            return response.text
 
-Format your response as a numbered list with exactly {num_consumer + num_business} queries total.
-Make sure each query is self-contained and doesn't require additional context."""
+        except Exception as e:
+            self.logger.error("Gemini API error: %s", e)
+            return None
 
-        system_message = "You are an expert at generating realistic search queries for business visibility testing. Create diverse, natural queries that real users would ask."
+    def get_multiple_responses(self, queries: List[str], progress_callback=None, result_callback=None) -> List[Dict[str, Any]]:
+        """Get AI responses for multiple queries with parallel processing.
 
-        return self.generate_response(prompt, system_message)
+        If given, result_callback receives each result in query order as soon as it and all earlier queries are done.
+        """
+        return asyncio.run(self._get_multiple_responses_async(queries, progress_callback, result_callback))
 
-    def get_ai_response(self, query: str) -> Optional[str]:
-        """Get AI response to a query using enhanced prompt for business suggestions."""
-        # Use the enhanced prompt that encourages business suggestions
-        return self.generate_response(query)
+    async def _get_multiple_responses_async(self, queries: List[str], progress_callback=None, result_callback=None) -> List[Dict[str, Any]]:
+        """Run all queries on one event loop; a new query starts as soon as any in-flight one finishes."""
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+        completed = 0
+        # Results that finished ahead of an earlier query, held until they can be released in order
+        pending = {}
+        next_idx = 0
 
-    def get_multiple_responses(self, queries: List[str], progress_callback=None) -> List[Dict[str, Any]]:
-        """Get AI responses for multiple queries with parallel processing."""
-        results = []
+        async def process_query(idx: int, query: str) -> Dict[str, Any]:
+            nonlocal completed, next_idx
+            async with semaphore:
+                response = await self.generate_response_async(query)
 
-        def process_query(query_data):
-            idx, query = query_data
-            response = self.get_ai_response(query)
+            completed += 1
             if progress_callback:
-                progress_callback(idx + 1, len(queries))
-            return {
+                progress_callback(completed, len(queries))
+            result = {
                 'query_id': idx + 1,
                 'query_text': query,
                 'response_text': response or "ERROR: Failed to get response",
                 'provider': self.provider
             }
-
-        # Process queries in batches to respect rate limits
-        batch_size = self.max_concurrent
-
-        for i in range(0, len(queries), batch_size):
-            batch_queries = list(enumerate(queries[i:i + batch_size], start=i))
-
-            with ThreadPoolExecutor(max_workers=self.max_concurrent) as executor:
-                batch_results = list(executor.map(process_query, batch_queries))
-                results.extend(batch_results)
-
-            # Brief pause between batches
-            if i + batch_size < len(queries):
-                time.sleep(2)
-
-        return results
+            if result_callback:
+                pending[idx] = result
+                while next_idx in pending:
+                    result_callback(pending.pop(next_idx))
+                    next_idx += 1
+            return result
+
+        return await asyncio.gather(*(process_query(idx, query) for idx, query in enumerate(queries)))
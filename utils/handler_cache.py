@@ -0,0 +1,21 @@
+import functools
+import importlib
+
+# Provider name -> (module, class) of its handler; a module is only imported once its provider is used
+HANDLER_CLASSES = {
+    'claude': ('.claude_handler', 'ClaudeHandler'),
+    'copilot': ('.copilot_handler', 'CopilotHandler'),
+    'gemini': ('.gemini_handler', 'GeminiHandler'),
+    'openai': ('.openai_handler', 'OpenAIHandler'),
+    'perplexity': ('.perplexity_handler', 'PerplexityHandler'),
+}
+
+@functools.lru_cache(maxsize=8)
+def get_handler(provider: str, **settings):
+    """Return the provider's handler for these settings, shared by every caller that asks with the same ones.
+
+    Lets a script's query generation and response collection reuse one client and its connections.
+    """
+    module_name, class_name = HANDLER_CLASSES[provider]
+    handler_class = getattr(importlib.import_module(module_name, __package__), class_name)
+    return handler_class(**settings)
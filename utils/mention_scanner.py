@@ -1,7 +1,70 @@
 import re
+import functools
 from typing import List, Dict, Any, Tuple
+from collections import Counter
 import logging
 
+# Try using pyahocorasick for single-pass multi-word matching
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# Context indicator words by polarity: '+' positive, '-' negative, '~' neutral/comparison
+CONTEXT_WORDS = {
+    '+': ('recommend', 'best', 'excellent', 'great', 'good', 'quality',
+          'trusted', 'reliable', 'professional', 'expert', 'top'),
+    '-': ('avoid', 'bad', 'poor', 'terrible', 'worst', 'problem',
+          'issue', 'complaint', 'disappointing'),
+    '~': ('option', 'alternative', 'consider', 'compare', 'choice',
+          'available', 'include', 'among', 'such as'),
+}
+
+def _build_context_automaton():
+    """Build an Aho-Corasick automaton that tags every context word with its polarity."""
+    automaton = ahocorasick.Automaton()
+    for polarity, words in CONTEXT_WORDS.items():
+        for word in words:
+            automaton.add_word(word, (polarity, word))
+    automaton.make_automaton()
+    return automaton
+
+_CONTEXT_AUTOMATON = _build_context_automaton() if AHOCORASICK_AVAILABLE else None
+
+# Try using Hyperscan to test all business/domain/competitor patterns in one pass
+try:
+    import hyperscan
+    HYPERSCAN_AVAILABLE = True
+except ImportError:
+    HYPERSCAN_AVAILABLE = False
+
+def _business_terms(business_name: str, aliases: Tuple[str, ...]) -> List[Tuple[str, str]]:
+    """Return (label, term) pairs for the business name and its non-empty aliases."""
+    terms = [('business_name', business_name)] + [('alias', alias) for alias in aliases]
+    return [(label, term) for label, term in terms if term]
+
+@functools.lru_cache(maxsize=128)
+def _build_patterns(business_name: str, aliases: Tuple[str, ...], competitors: Tuple[str, ...]):
+    """Compile the business and competitor regexes from lowercased terms; cached per scanner configuration."""
+    # Business name patterns, one named group per term so a match tells us which term it was
+    business_terms = _business_terms(business_name, aliases)
+    if business_terms:
+        business_pattern = '|'.join(f'(?P<g{i}>{re.escape(term)})' for i, (_, term) in enumerate(business_terms))
+        business_regex = re.compile(business_pattern, re.IGNORECASE)
+    else:
+        business_regex = None
+
+    # Competitor patterns
+    competitor_escaped = [re.escape(comp) for comp in competitors if comp]
+    if competitor_escaped:
+        competitor_pattern = '|'.join(f'({comp})' for comp in competitor_escaped)
+        competitor_regex = re.compile(competitor_pattern, re.IGNORECASE)
+    else:
+        competitor_regex = None
+
+    return business_regex, competitor_regex
+
 class MentionScanner:
     def __init__(self, business_name: str, business_url: str, business_aliases: List[str] = None, competitors: List[str] = None):
         self.business_name = business_name
@@ -10,79 +73,103 @@ class MentionScanner:
         self.competitors = competitors or []
         self.logger = logging.getLogger(__name__)
 
-        # Create domain pattern from URL
-        self.domain_pattern = self._create_domain_pattern(business_url)
+        # Lowercased once here rather than wherever a pattern is built
+        self._business_name_lc = business_name.lower()
+        self._aliases_lc = tuple(alias.lower() for alias in self.business_aliases)
+        self._competitors_lc = tuple(comp.lower() for comp in self.competitors)
+
+        # Domain from URL; a single literal, so it is matched with a substring test rather than a regex
+        self._domain_lower = self._extract_domain(business_url).lower()
+        self.domain_pattern = re.escape(self._domain_lower)
 
         # Pre-compile regex patterns for better performance
         self._compile_patterns()
 
-    def _create_domain_pattern(self, url: str) -> str:
-        """Create regex pattern for domain matching."""
+    def _extract_domain(self, url: str) -> str:
+        """Extract the bare domain (no scheme, www. or path) from a URL."""
         if not url:
             return ""
 
-        # Extract domain
         domain = re.sub(r'^https?://', '', url)
         domain = re.sub(r'^www\.', '', domain)
-        domain = domain.split('/')[0]
-
-        # Escape special regex characters
-        domain = re.escape(domain)
-        return domain
+        return domain.split('/')[0]
 
     def _compile_patterns(self):
         """Pre-compile all regex patterns for better performance."""
-        # Business name patterns
-        business_terms = [self.business_name] + self.business_aliases
-        business_escaped = [re.escape(term.lower()) for term in business_terms if term]
-
-        if business_escaped:
-            business_pattern = '|'.join(f'({term})' for term in business_escaped)
-            self.business_regex = re.compile(business_pattern, re.IGNORECASE)
-        else:
-            self.business_regex = None
-
-        # Domain pattern
-        if self.domain_pattern:
-            self.domain_regex = re.compile(self.domain_pattern, re.IGNORECASE)
-        else:
-            self.domain_regex = None
-
-        # Competitor patterns
-        if self.competitors:
-            competitor_escaped = [re.escape(comp.lower()) for comp in self.competitors if comp]
-            if competitor_escaped:
-                competitor_pattern = '|'.join(f'({comp})' for comp in competitor_escaped)
-                self.competitor_regex = re.compile(competitor_pattern, re.IGNORECASE)
-            else:
-                self.competitor_regex = None
-        else:
-            self.competitor_regex = None
+        business_terms = _business_terms(self.business_name, tuple(self.business_aliases))
+        self._group_to_label = {f'g{i}': (label, term) for i, (label, term) in enumerate(business_terms)}
+
+        # Compiled patterns are shared by scanners with the same configuration
+        self.business_regex, self.competitor_regex = _build_patterns(
+            self._business_name_lc, self._aliases_lc, self._competitors_lc
+        )
+
+        # Hyperscan prefilter: one database holding every pattern, labelled by kind
+        self._hs_db = None
+        self._hs_kinds = []
+        if HYPERSCAN_AVAILABLE:
+            patterns = [('business', re.escape(term)) for term in (self._business_name_lc,) + self._aliases_lc if term]
+            if self.domain_pattern:
+                patterns.append(('domain', self.domain_pattern))
+            patterns += [('competitor', re.escape(comp)) for comp in self._competitors_lc if comp]
+
+            # Hyperscan only folds ASCII case, so non-ASCII terms stay on the re path
+            if patterns and all(pattern.isascii() for _, pattern in patterns):
+                self._hs_db = hyperscan.Database()
+                self._hs_db.compile(
+                    expressions=[pattern.encode() for _, pattern in patterns],
+                    ids=list(range(len(patterns))),
+                    elements=len(patterns),
+                    flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH] * len(patterns)
+                )
+                self._hs_kinds = [kind for kind, _ in patterns]
+
+    def _prescan(self, text: str) -> set:
+        """Return which kinds of pattern ('business', 'domain', 'competitor') occur in text, in one Hyperscan pass."""
+        found = set()
+
+        def on_match(pattern_id, start, end, flags, context):
+            found.add(self._hs_kinds[pattern_id])
+
+        self._hs_db.scan(text.encode('utf-8'), match_event_handler=on_match)
+        return found
 
     def scan_for_business_mentions(self, text: str) -> Dict[str, Any]:
         """Scan text for business mentions and return detailed analysis."""
         if not text:
             return self._empty_result()
 
-        text_lower = text.lower()
-
-        # Check for business name mentions
-        business_mentioned = self._check_business_name_mentions(text_lower)
+        # Compiled patterns are case-insensitive, so they scan the original text; the domain and context
+        # checks share one lowercased copy, made at most once per scan and only when one of them needs it
+        text_lower = None
+        if self._hs_db is not None:
+            # One pass finds which pattern kinds occur; the re-based checks below only run for kinds that do
+            found = self._prescan(text)
+            domain_mentioned = 'domain' in found
+        else:
+            found = None
+            # Check for URL/domain mentions
+            text_lower = text.lower()
+            domain_mentioned = self._check_domain_mentions(text_lower)
 
-        # Check for URL/domain mentions
-        domain_mentioned = self._check_domain_mentions(text_lower)
+        # Business name and alias mentions, found once and reused for position and details
+        business_matches = self._find_business_mentions(text) if found is None or 'business' in found else []
+        business_mentioned = bool(business_matches)
 
         # Overall business mentioned
         mentioned = business_mentioned or domain_mentioned
 
         # Check position if mentioned
-        position = self._get_mention_position(text_lower) if mentioned else None
+        position = self._get_mention_position(text, business_matches) if mentioned else None
 
         # Analyze context
-        context_type = self._analyze_context(text_lower) if mentioned else None
+        if mentioned:
+            context_type = self._analyze_context(text_lower if text_lower is not None else text.lower())
+        else:
+            context_type = None
 
         # Check competitors
-        competitors_mentioned = self._check_competitors(text_lower)
+        competitors_mentioned = self._check_competitors(text) if found is None or 'competitor' in found else []
 
         return {
             'business_mentioned': mentioned,
@@ -91,68 +178,49 @@ class MentionScanner:
             'position': position,
             'context_type': context_type,
             'competitors_mentioned': competitors_mentioned,
-            'mention_details': self._get_mention_details(text, mentioned)
+            'mention_details': self._get_mention_details(business_matches, mentioned)
         }
 
-    def _check_business_name_mentions(self, text_lower: str) -> bool:
-        """Check if business name or aliases are mentioned using compiled regex."""
+    def _find_business_mentions(self, text: str) -> List[re.Match]:
+        """Find every business name or alias mention in one pass of the compiled regex."""
         if self.business_regex:
-            return bool(self.business_regex.search(text_lower))
-        return False
+            return list(self.business_regex.finditer(text))
+        return []
 
     def _check_domain_mentions(self, text_lower: str) -> bool:
-        """Check if business domain/URL is mentioned using compiled regex."""
-        if self.domain_regex:
-            return bool(self.domain_regex.search(text_lower))
-        return False
-
-    def _get_mention_position(self, text_lower: str) -> str:
-        """Determine where in the text the business is mentioned using compiled regex."""
-        text_length = len(text_lower)
-        if text_length == 0:
-            return "Unknown"
+        """Check if business domain/URL is mentioned in the lowercased text (substring test)."""
+        return bool(self._domain_lower) and self._domain_lower in text_lower
 
-        # Use compiled regex to find first mention position
-        if self.business_regex:
-            match = self.business_regex.search(text_lower)
-            if match:
-                business_pos = match.start()
-                # Calculate relative position
-                relative_pos = business_pos / text_length
+    def _get_mention_position(self, text: str, business_matches: List[re.Match]) -> str:
+        """Determine where in the text the business is first mentioned."""
+        text_length = len(text)
+        if text_length == 0 or not business_matches:
+            return "Unknown"
 
-                if relative_pos < 0.33:
-                    return "Beginning"
-                elif relative_pos < 0.67:
-                    return "Middle"
-                else:
-                    return "End"
+        # Calculate relative position of the first mention
+        relative_pos = business_matches[0].start() / text_length
 
-        return "Unknown"
+        if relative_pos < 0.33:
+            return "Beginning"
+        elif relative_pos < 0.67:
+            return "Middle"
+        else:
+            return "End"
 
     def _analyze_context(self, text_lower: str) -> str:
-        """Analyze the context in which the business is mentioned."""
-        # Positive indicators
-        positive_words = [
-            'recommend', 'best', 'excellent', 'great', 'good', 'quality',
-            'trusted', 'reliable', 'professional', 'expert', 'top'
-        ]
-
-        # Negative indicators
-        negative_words = [
-            'avoid', 'bad', 'poor', 'terrible', 'worst', 'problem',
-            'issue', 'complaint', 'disappointing'
-        ]
-
-        # Neutral/comparison indicators
-        comparison_words = [
-            'option', 'alternative', 'consider', 'compare', 'choice',
-            'available', 'include', 'among', 'such as'
-        ]
-
-        # Count word types around business mentions
-        positive_count = sum(1 for word in positive_words if word in text_lower)
-        negative_count = sum(1 for word in negative_words if word in text_lower)
-        comparison_count = sum(1 for word in comparison_words if word in text_lower)
+        """Analyze the context in which the business is mentioned, given the lowercased text."""
+        # Indicator words are lowercase; only texts that mention the business get here
+        # Count how many distinct indicator words of each polarity appear
+        if _CONTEXT_AUTOMATON is not None:
+            # One linear pass over the text instead of a substring search per word
+            found = {payload for _, payload in _CONTEXT_AUTOMATON.iter(text_lower)}
+            counts = Counter(polarity for polarity, _ in found)
+        else:
+            counts = Counter({
+                polarity: sum(1 for word in words if word in text_lower)
+                for polarity, words in CONTEXT_WORDS.items()
+            })
+        positive_count, negative_count, comparison_count = counts['+'], counts['-'], counts['~']
 
         # Determine context
         if positive_count > negative_count and positive_count > 0:
@@ -164,57 +232,32 @@ class MentionScanner:
         else:
             return "Neutral"
 
-    def _check_competitors(self, text_lower: str) -> List[str]:
+    def _check_competitors(self, text: str) -> List[str]:
         """Check which competitors are mentioned using compiled regex."""
-        mentioned_competitors = []
-
-        if self.competitor_regex:
-            matches = self.competitor_regex.findall(text_lower)
-            # Extract non-empty groups from matches
-            for match in matches:
-                if isinstance(match, tuple):
-                    # Find the non-empty group
-                    for group in match:
-                        if group:
-                            mentioned_competitors.append(group)
-                            break
-                else:
-                    mentioned_competitors.append(match)
-
-        return mentioned_competitors
-
-    def _get_mention_details(self, text: str, mentioned: bool) -> Dict[str, Any]:
+        if not self.competitor_regex:
+            return []
+
+        # Report matches lowercased, as when the caller passes lowercase text
+        return [match.group().lower() for match in self.competitor_regex.finditer(text)]
+
+    def _get_mention_details(self, business_matches: List[re.Match], mentioned: bool) -> Dict[str, Any]:
         """Get detailed information about mentions."""
         if not mentioned:
             return {}
 
         details = {}
-        text_lower = text.lower()
 
-        # Find exact mention locations
+        # Exact mention locations; the named group tells which term matched
         mentions = []
-
-        # Check business name
-        business_matches = list(re.finditer(re.escape(self.business_name.lower()), text_lower))
         for match in business_matches:
+            label, term = self._group_to_label[match.lastgroup]
             mentions.append({
-                'text': self.business_name,
+                'text': term,
                 'start': match.start(),
                 'end': match.end(),
-                'type': 'business_name'
+                'type': label
             })
 
-        # Check aliases
-        for alias in self.business_aliases:
-            alias_matches = list(re.finditer(re.escape(alias.lower()), text_lower))
-            for match in alias_matches:
-                mentions.append({
-                    'text': alias,
-                    'start': match.start(),
-                    'end': match.end(),
-                    'type': 'alias'
-                })
-
         details['mentions'] = mentions
         details['total_mentions'] = len(mentions)
 
@@ -13,10 +13,17 @@ from .claude_handler import ClaudeHandler
 class MultiAPIOrchestrator:
     """Orchestrator for running queries across multiple AI providers simultaneously."""
 
-    def __init__(self, config: dict):
+    def __init__(self, config: dict, max_workers: int = 8):
         """Initialize handlers for all available APIs based on config."""
         self.config = config
         self.handlers = {}
+        # Outer pool that runs providers side by side; each handler bounds its own requests with max_concurrent
+        self.max_workers = max_workers
+
+        # Per-provider health, used to prefer the fastest provider that is currently working
+        self._latency_ema: Dict[str, float] = {}
+        self._fail_count: Dict[str, int] = {}
+        self._stats_lock = threading.Lock()
         self.logger = logging.getLogger(__name__)
 
         # Initialize available handlers based on API keys in config
@@ -33,11 +40,12 @@ class MultiAPIOrchestrator:
                     api_key=self.config['perplexity_api_key'],
                     model=self.config.get('perplexity_model', 'sonar'),
                     temperature=self.config.get('temperature', 0.7),
-                    max_tokens=self.config.get('max_tokens', 4000)
+                    max_tokens=self.config.get('max_tokens', 4000),
+                    max_concurrent=self.config.get('perplexity_max_concurrent', 3)
                 )
                 self.logger.info("Perplexity handler initialized")
             except Exception as e:
-                self.logger.error(f"Failed to initialize Perplexity handler: {e}")
+                self.logger.error("Failed to initialize Perplexity handler: %s", e)
         elif not self.config.get('enable_perplexity', True):
             self.logger.info("Perplexity disabled in configuration")
 
@@ -53,7 +61,7 @@ class MultiAPIOrchestrator:
                 )
                 self.logger.info("OpenAI handler initialized")
             except Exception as e:
-                self.logger.error(f"Failed to initialize OpenAI handler: {e}")
+                self.logger.error("Failed to initialize OpenAI handler: %s", e)
         elif not self.config.get('enable_openai', True):
             self.logger.info("OpenAI disabled in configuration")
 
@@ -69,56 +77,97 @@ class MultiAPIOrchestrator:
                 )
                 self.logger.info("Claude handler initialized")
             except Exception as e:
-                self.logger.error(f"Failed to initialize Claude handler: {e}")
+                self.logger.error("Failed to initialize Claude handler: %s", e)
         elif not self.config.get('enable_claude', True):
             self.logger.info("Claude disabled in configuration")
 
         if not self.handlers:
             raise ValueError("No API handlers could be initialized. Please check your API keys.")
 
-        self.logger.info(f"Initialized {len(self.handlers)} API handlers: {list(self.handlers.keys())}")
+        self.logger.info("Initialized %s API handlers: %s", len(self.handlers), list(self.handlers.keys()))
 
     def get_available_providers(self) -> List[str]:
         """Get list of available providers."""
         return list(self.handlers.keys())
 
+    def _record_call(self, provider: str, elapsed: float, ok: bool):
+        """Fold one call's latency and outcome into the provider's health stats."""
+        with self._stats_lock:
+            prev = self._latency_ema.get(provider)
+            self._latency_ema[provider] = elapsed if prev is None else 0.8 * prev + 0.2 * elapsed
+            fails = self._fail_count.get(provider, 0)
+            # Failures decay one per success so a provider that recovers climbs back up
+            self._fail_count[provider] = fails + 1 if not ok else max(0, fails - 1)
+
+    def _timed_call(self, provider: str, fn, *args):
+        """Call fn(*args), recording its latency; an empty result counts as a failure."""
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            result = fn(*args)
+            ok = bool(result)
+            return result
+        finally:
+            self._record_call(provider, time.perf_counter() - t0, ok)
+
+    @staticmethod
+    def _accepts_requests(handler) -> bool:
+        """False while the handler's circuit breaker is open (or it reports itself blocked)."""
+        breaker = getattr(handler, 'breaker', None)
+        if breaker is not None:
+            return breaker.available
+        return not getattr(handler, 'is_blocked', False)
+
+    def _ranked_providers(self) -> List[str]:
+        """Providers that are not blocked, fastest and healthiest first."""
+        with self._stats_lock:
+            score = {
+                provider: self._latency_ema.get(provider, 0.0) + 1000 * self._fail_count.get(provider, 0)
+                for provider in self.handlers
+            }
+        available = [p for p, handler in self.handlers.items() if self._accepts_requests(handler)]
+        return sorted(available, key=score.__getitem__)
+
     def generate_queries(self, business_name: str, business_url: str, business_location: str, num_consumer: int, num_business: int, prompt_template: str = None) -> Optional[str]:
         """Generate queries using available handlers with fallback."""
         if not self.handlers:
             self.logger.error("No handlers available")
             return None
 
-        # Try providers in order of preference: perplexity, openai, claude
-        provider_order = ['perplexity', 'openai', 'claude']
+        providers = self._ranked_providers()
+        if not providers:
+            self.logger.error("All providers are blocked")
+            return None
 
-        for provider_name in provider_order:
-            if provider_name in self.handlers:
-                handler = self.handlers[provider_name]
-                self.logger.info(f"Attempting query generation with {provider_name}")
+        # Ask every provider at once and keep the first usable result, so wall time is the fastest provider's latency
+        executor = ThreadPoolExecutor(max_workers=len(providers))
+        future_to_provider = {
+            executor.submit(self._timed_call, provider_name, self.handlers[provider_name].generate_queries,
+                            business_name, business_url, business_location, num_consumer, num_business, prompt_template): provider_name
+            for provider_name in providers
+        }
+        self.logger.info("Attempting query generation with %s in parallel", ', '.join(future_to_provider.values()))
 
+        try:
+            for future in as_completed(future_to_provider):
+                provider_name = future_to_provider[future]
                 try:
-                    result = handler.generate_queries(business_name, business_url, business_location, num_consumer, num_business, prompt_template)
-                    if result:
-                        self.logger.info(f"Successfully generated queries using {provider_name}")
-                        return result
-                    else:
-                        self.logger.warning(f"Query generation failed with {provider_name}, trying next provider")
+                    result = future.result()
                 except Exception as e:
-                    self.logger.warning(f"Error with {provider_name}: {e}, trying next provider")
+                    self.logger.warning("Error with %s: %s", provider_name, e)
                     continue
 
-        # If no provider worked, try any remaining handlers
-        for provider_name, handler in self.handlers.items():
-            if provider_name not in provider_order:
-                self.logger.info(f"Attempting query generation with {provider_name} (fallback)")
-                try:
-                    result = handler.generate_queries(business_name, business_url, business_location, num_consumer, num_business, prompt_template)
-                    if result:
-                        self.logger.info(f"Successfully generated queries using {provider_name}")
-                        return result
-                except Exception as e:
-                    self.logger.warning(f"Error with {provider_name}: {e}")
-                    continue
+                if result:
+                    self.logger.info("Successfully generated queries using %s", provider_name)
+                    # Stop the slower providers from sitting out rate-limit backoffs for an answer nobody needs
+                    for pending, other_provider in future_to_provider.items():
+                        if not pending.done():
+                            self.handlers[other_provider].cancel()
+                    return result
+                self.logger.warning("Query generation failed with %s", provider_name)
+        finally:
+            # Don't wait for the slower providers once one has answered
+            executor.shutdown(wait=False, cancel_futures=True)
 
         self.logger.error("All providers failed for query generation")
         return None
@@ -128,11 +177,12 @@ class MultiAPIOrchestrator:
         if provider and provider in self.handlers:
             handler = self.handlers[provider]
         else:
-            # Use first available handler
-            handler = next(iter(self.handlers.values()))
+            # Use the fastest healthy handler, or the first one if every provider is blocked
+            ranked = self._ranked_providers()
+            handler = self.handlers[ranked[0]] if ranked else next(iter(self.handlers.values()))
             provider = handler.provider
 
-        response = handler.get_ai_response(query)
+        response = self._timed_call(provider, handler.get_ai_response, query)
         return {
             'provider': provider,
             'response_text': response or "ERROR: Failed to get response",
@@ -142,7 +192,7 @@ class MultiAPIOrchestrator:
     def get_multiple_responses_single_provider(self, queries: List[str], provider: str, progress_callback=None) -> List[Dict[str, Any]]:
         """Get responses from a single provider for multiple queries."""
         if provider not in self.handlers:
-            self.logger.error(f"Provider {provider} not available")
+            self.logger.error("Provider %s not available", provider)
             return []
 
         handler = self.handlers[provider]
@@ -154,7 +204,7 @@ class MultiAPIOrchestrator:
 
         def process_provider(provider_data):
             provider, handler = provider_data
-            self.logger.info(f"Starting {provider} processing...")
+            self.logger.info("Starting %s processing...", provider)
 
             def provider_progress(current, total):
                 if progress_callback:
@@ -162,14 +212,14 @@ class MultiAPIOrchestrator:
 
             try:
                 provider_results = handler.get_multiple_responses(queries, provider_progress)
-                self.logger.info(f"Completed {provider} processing: {len(provider_results)} responses")
+                self.logger.info("Completed %s processing: %s responses", provider, len(provider_results))
                 return provider, provider_results
             except Exception as e:
-                self.logger.error(f"Error with {provider}: {e}")
+                self.logger.error("Error with %s: %s", provider, e)
                 return provider, []
 
         # Run all providers in parallel
-        with ThreadPoolExecutor(max_workers=len(self.handlers)) as executor:
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
             future_to_provider = {
                 executor.submit(process_provider, item): item[0]
                 for item in self.handlers.items()
@@ -195,7 +245,7 @@ class MultiAPIOrchestrator:
                     'provider': provider
                 }
             except Exception as e:
-                self.logger.error(f"Error with {provider}: {e}")
+                self.logger.error("Error with %s: %s", provider, e)
                 return provider, {
                     'response_text': f"ERROR: {str(e)}",
                     'timestamp': time.time(),
@@ -203,7 +253,7 @@ class MultiAPIOrchestrator:
                 }
 
         # Run all providers in parallel for single query
-        with ThreadPoolExecutor(max_workers=len(self.handlers)) as executor:
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
             future_to_provider = {
                 executor.submit(get_provider_response, item): item[0]
                 for item in self.handlers.items()
@@ -1,10 +1,21 @@
 import time
 import json
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 import logging
 from concurrent.futures import ThreadPoolExecutor
 import threading
 
+from . import _gpt_cache
+from ._query_prompt import QUERY_SYSTEM_MESSAGE, build_query_prompt
+from ._retry import with_retry
+
+# Cached responses are reused for a day, then fetched again. Keys are built differently from
+# PerplexityHandler's, so this handler keeps its own namespace
+CACHE_NAMESPACE = 'openai_compatible'
+CACHE_MAX_AGE = 86400
+
+ASSISTANT_SYSTEM_MESSAGE = "You are a helpful AI assistant. Answer the user's question naturally and helpfully. If relevant businesses come to mind, mention them."
+
 # Try using OpenAI library with custom base URL (many providers support this)
 try:
     import openai
@@ -15,7 +26,7 @@ except ImportError:
 class OpenAICompatibleHandler:
     """Handler that uses OpenAI library with custom base URL for Perplexity."""
 
-    def __init__(self, api_key: str, model: str = "llama-3.1-sonar-large-128k-online", temperature: float = 0.7, max_tokens: int = 4000):
+    def __init__(self, api_key: str, model: str = "llama-3.1-sonar-large-128k-online", temperature: float = 0.7, max_tokens: int = 4000, use_cache: bool = True):
         if not OPENAI_AVAILABLE:
             raise ImportError("OpenAI library required for this handler. Install with: pip install openai")
 
@@ -25,6 +36,7 @@ class OpenAICompatibleHandler:
         self.max_tokens = max_tokens
         self.rate_limit_delay = 1.0  # Slower for compatibility
         self.max_concurrent = 1  # Sequential for compatibility
+        self.use_cache = use_cache  # Reuse on-disk responses for identical requests
 
         # Initialize OpenAI client with Perplexity endpoint
         self.client = openai.OpenAI(
@@ -32,93 +44,93 @@ class OpenAICompatibleHandler:
             base_url="https://api.pplx.ai/v1"
         )
 
-        logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
         self._lock = threading.Lock()
+        # Event of the latest generate_queries call; cancel() sets it to stop that call waiting out rate limits
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        """Abandon the rate-limit retries of the running generate_queries call, e.g. after another provider already answered.
+
+        Other requests on this handler, including later ones, keep retrying as usual.
+        """
+        self._cancel.set()
+
+    def generate_response(self, prompt: str, system_message: Optional[str] = None, cancel: Optional[threading.Event] = None,
+                          use_cache: Optional[bool] = None) -> Optional[str]:
+        """Generate a response using OpenAI-compatible format.
+
+        use_cache overrides the handler's use_cache setting for this call; pass False to force a fresh answer.
+        """
+        return self._generate(prompt, system_message, cancel, use_cache)[0]
+
+    def _generate(self, prompt: str, system_message: Optional[str], cancel: Optional[threading.Event] = None,
+                  use_cache: Optional[bool] = None) -> Tuple[Optional[str], bool]:
+        """Return (response, whether it came from the cache)."""
+        if use_cache is None:
+            use_cache = self.use_cache
+        key = _gpt_cache.make_key(
+            json.dumps({"m": self.model, "t": self.temperature, "mx": self.max_tokens, "s": system_message, "p": prompt}, sort_keys=True)
+        )
+        if use_cache:
+            cached = _gpt_cache.get(key, namespace=CACHE_NAMESPACE, max_age=CACHE_MAX_AGE)
+            if cached is not None:
+                return cached, True
 
-    def generate_response(self, prompt: str, system_message: Optional[str] = None) -> Optional[str]:
-        """Generate a response using OpenAI-compatible format."""
         try:
             messages = []
             if system_message:
                 messages.append({"role": "system", "content": system_message})
             messages.append({"role": "user", "content": prompt})
 
-            self.logger.info(f"Making OpenAI-compatible request with model {self.model}")
-
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=self.temperature,
-                max_tokens=self.max_tokens
+            self.logger.info("Making OpenAI-compatible request with model %s", self.model)
+
+            response = with_retry(
+                lambda: self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens
+                ),
+                (openai.RateLimitError,),
+                cancel=cancel
             )
 
             # Rate limiting
             time.sleep(self.rate_limit_delay)
 
-            return response.choices[0].message.content
+            content = response.choices[0].message.content
+            if use_cache and content:
+                _gpt_cache.put(key, content, namespace=CACHE_NAMESPACE)
+            return content, False
 
         except openai.AuthenticationError:
             self.logger.error("Authentication failed. Please check your Perplexity API key.")
-            return None
         except openai.RateLimitError:
-            self.logger.warning("Rate limit exceeded. Waiting 60 seconds...")
-            time.sleep(60)
-            return self.generate_response(prompt, system_message)
+            self.logger.warning("Rate limit still exceeded after retries (or retry cancelled)")
         except openai.APIError as e:
-            self.logger.error(f"Perplexity API error: {e}")
-            return None
+            self.logger.error("Perplexity API error: %s", e)
         except Exception as e:
-            self.logger.error(f"Unexpected error: {e}")
-            return None
+            self.logger.error("Unexpected error: %s", e)
+        return None, False
 
     def generate_queries(self, business_name: str, business_url: str, num_consumer: int, num_business: int, prompt_template: str = None) -> Optional[str]:
         """Generate queries for business visibility testing."""
-        if prompt_template:
-            # Use provided template with variable substitution
-            prompt = prompt_template.format(
-                total_queries=num_consumer + num_business,
-                business_name=business_name,
-                business_url=business_url,
-                num_consumer=num_consumer,
-                num_business=num_business
-            )
-        else:
-            # Fallback to simple prompt
-            prompt = f"""Generate {num_consumer + num_business} realistic search queries to test AI visibility for {business_name} ({business_url}).
-
-Create exactly {num_consumer} consumer-focused queries and {num_business} business-focused queries.
+        # A fresh event per call, so a cancel() aimed at this call never leaks into later requests
+        self._cancel = cancel = threading.Event()
+        prompt = build_query_prompt(business_name, business_url, None, num_consumer, num_business, prompt_template)
+        return self.generate_response(prompt, QUERY_SYSTEM_MESSAGE, cancel=cancel)
 
-CONSUMER QUERIES ({num_consumer}):
-- Questions a customer might ask when they have a problem that {business_name} could solve
-- Should NOT mention {business_name} directly
-- Should be natural, conversational questions
-- Examples: "My car suspension is bouncing on rough roads", "Where can I get quality suspension upgrades?"
-
-BUSINESS QUERIES ({num_business}):
-- Questions someone might ask when specifically researching {business_name}
-- Can mention the business name or ask for comparisons
-- Examples: "What do people think about {business_name}?", "Is {business_name} better than competitors?"
-
-Format your response as a numbered list with exactly {num_consumer + num_business} queries total.
-Make sure each query is self-contained and doesn't require additional context."""
-
-        system_message = "You are an expert at generating realistic search queries for business visibility testing. Create diverse, natural queries that real users would ask."
-
-        return self.generate_response(prompt, system_message)
-
-    def get_ai_response(self, query: str) -> Optional[str]:
+    def get_ai_response(self, query: str, use_cache: Optional[bool] = None) -> Optional[str]:
         """Get AI response to a query as if the user was asking for help."""
-        system_message = "You are a helpful AI assistant. Answer the user's question naturally and helpfully. If relevant businesses come to mind, mention them."
-
-        return self.generate_response(query, system_message)
+        return self.generate_response(query, ASSISTANT_SYSTEM_MESSAGE, use_cache=use_cache)
 
-    def get_multiple_responses(self, queries: List[str], progress_callback=None) -> List[Dict[str, Any]]:
+    def get_multiple_responses(self, queries: List[str], progress_callback=None, use_cache: Optional[bool] = None) -> List[Dict[str, Any]]:
         """Get AI responses for multiple queries sequentially (safer for compatibility)."""
         results = []
 
         for idx, query in enumerate(queries):
-            response = self.get_ai_response(query)
+            response, from_cache = self._generate(query, ASSISTANT_SYSTEM_MESSAGE, use_cache=use_cache)
             if progress_callback:
                 progress_callback(idx + 1, len(queries))
 
@@ -128,8 +140,8 @@ Make sure each query is self-contained and doesn't require additional context.""
                 'response_text': response or "ERROR: Failed to get response"
             })
 
-            # Longer delay between requests for compatibility
-            if idx < len(queries) - 1:
+            # Longer delay between requests for compatibility; cache hits never reached the API
+            if not from_cache and idx < len(queries) - 1:
                 time.sleep(2)
 
         return results
\ No newline at end of file
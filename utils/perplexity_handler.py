@@ -1,242 +1,555 @@
 import requests
-import time
+import httpx
+import asyncio
 import json
-from typing import Optional, Dict, Any, List
+import re
+import statistics
+from typing import Optional, Dict, Any, Iterator, List
 import logging
-from concurrent.futures import ThreadPoolExecutor
+import functools
+from pathlib import Path
 import threading
+from concurrent.futures import Future
+from collections import deque
+
+# Try using orjson for faster request/response (de)serialization
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# requests (urllib3) and httpx only decode br bodies when brotli is installed, so only advertise it then
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+from . import _gpt_cache
+from ._query_prompt import QUERY_SYSTEM_MESSAGE, build_query_prompt
+from .rate_limit import AdaptiveLimiter
+from .circuit_breaker import CircuitBreaker
+from ._retry import with_retry, with_retry_async
+
+PROMPTS_DIR = Path(__file__).resolve().parent.parent / 'prompts'
+
+@functools.lru_cache(maxsize=1)
+def _read_standard_prompt() -> str:
+    """Read the standard Perplexity prompt once; all handler instances share it."""
+    return (PROMPTS_DIR / 'standard_perplexity_prompt.txt').read_text(encoding='utf-8').strip()
+
+_json_loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+
+def _json_dumps(obj: Any, sort_keys: bool = False) -> bytes:
+    """Serialize obj to UTF-8 JSON bytes."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS if sort_keys else 0)
+    return json.dumps(obj, sort_keys=sort_keys, ensure_ascii=False).encode('utf-8')
+
+# Cached responses are reused for a day, then fetched again
+CACHE_NAMESPACE = 'perplexity'
+CACHE_MAX_AGE = 86400
+
+# max_tokens is tuned to 1.5x the 95th percentile of recent output lengths once this many are known
+MIN_LENGTH_HISTORY = 8
+MAX_TOKENS_HEADROOM = 1.5
+
+class RateLimited(Exception):
+    """Raised on a 429 so the retry helpers can back off; carries the response for its Retry-After header."""
+
+    def __init__(self, response):
+        super().__init__("Perplexity rate limit exceeded")
+        self.response = response
+
+# Errors worth another attempt; anything else is reported straight away
+RETRYABLE_ERRORS = (RateLimited, requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+ASYNC_RETRYABLE_ERRORS = (RateLimited, httpx.TransportError)
+
+# Optional ```json fence around a batched answer array
+JSON_FENCE_RE = re.compile(r'^\s*```(?:json)?\s*|\s*```\s*$')
 
 class PerplexityHandler:
     """Direct HTTP handler for Perplexity API to avoid OpenAI library conflicts."""
 
-    def __init__(self, api_key: str, model: str = "sonar", temperature: float = 0.7, max_tokens: int = 4000):
+    def __init__(self, api_key: str, model: str = "sonar", temperature: float = 0.7, max_tokens: int = 4000, use_cache: bool = True,
+                 prompt_batch_size: int = 1, max_concurrent: int = 3):
         self.api_key = api_key
         self.model = model
         self.temperature = temperature
-        self.max_tokens = max_tokens
+        self.max_tokens = max_tokens  # Upper bound; requests ask for less once typical output lengths are known
+        # Recent output lengths in tokens, per system prompt (answers and query lists differ a lot)
+        self._output_lengths: Dict[Optional[str], deque] = {}
         self.rate_limit_delay = 1.5  # Slightly longer delay
-        self.max_concurrent = 1  # Sequential for compatibility
+        self.max_concurrent = max_concurrent  # Requests in flight at once
+        # Paces requests from the x-ratelimit-* headers instead of sleeping a fixed delay after each one
+        self.limiter = AdaptiveLimiter(default_rpm=60)
         self.base_url = "https://api.pplx.ai/v1/chat/completions"
         self.provider = "perplexity"
+        self.use_cache = use_cache  # Reuse on-disk responses for identical requests
+        # Queries answered per request in get_multiple_responses; 1 keeps one independent request per query
+        self.prompt_batch_size = prompt_batch_size
+
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        # Event of the latest generate_queries call; cancel() sets it to stop that call waiting out rate limits
+        self._cancel = threading.Event()
+
+        # Requests currently on the wire, by cache key, so identical concurrent calls share one
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+        self._inflight_async: Dict[str, asyncio.Future] = {}
 
         # Load standard prompt
         self.standard_prompt = self._load_standard_prompt()
 
-        logging.basicConfig(level=logging.INFO)
-        self.logger = logging.getLogger(__name__)
-        self._lock = threading.Lock()
+        # Static request headers, built once and reused for every call
+        self._headers = self._build_headers()
+
+        # One pooled session so sync calls reuse keep-alive connections instead of a new TLS handshake each time
+        self.session = requests.Session()
+        self.session.headers.update(self._headers)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=0)
+        self.session.mount("https://", adapter)
+
+        # Fail fast while Cloudflare keeps blocking us, probing again every five minutes
+        self.breaker = CircuitBreaker(max_failures=3, half_open_after=300)
+
+    @property
+    def is_blocked(self) -> bool:
+        """True while the circuit breaker is rejecting requests."""
+        return not self.breaker.available
 
-        # Track failures to avoid spam
-        self.consecutive_failures = 0
-        self.max_failures = 3
-        self.is_blocked = False
+    def cancel(self):
+        """Abandon the rate-limit retries of the running generate_queries call, e.g. after another provider already answered.
+
+        Other requests on this handler, including later ones, keep retrying as usual.
+        """
+        self._cancel.set()
 
     def _load_standard_prompt(self) -> str:
         """Load the standard prompt for Perplexity."""
         try:
-            import os
-            prompt_path = os.path.join(os.path.dirname(__file__), '..', 'prompts', 'standard_perplexity_prompt.txt')
-            with open(prompt_path, 'r', encoding='utf-8') as f:
-                return f.read().strip()
+            return _read_standard_prompt()
         except Exception as e:
-            self.logger.warning(f"Could not load standard prompt: {e}")
+            self.logger.warning("Could not load standard prompt: %s", e)
             return "You are a helpful AI assistant. Answer the user's question naturally and helpfully. If relevant businesses come to mind, mention them."
 
-    def generate_response(self, prompt: str, system_message: Optional[str] = None) -> Optional[str]:
+    def _build_headers(self) -> Dict[str, str]:
+        """Build the enhanced request headers sent with every Perplexity call."""
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+            "Accept-Language": "en-US,en;q=0.9",
+            "Accept-Encoding": ACCEPT_ENCODING,
+            "Cache-Control": "no-cache",
+            "Pragma": "no-cache",
+            "Sec-Ch-Ua": '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"',
+            "Sec-Ch-Ua-Mobile": "?0",
+            "Sec-Ch-Ua-Platform": '"Windows"',
+            "Sec-Fetch-Dest": "empty",
+            "Sec-Fetch-Mode": "cors",
+            "Sec-Fetch-Site": "cross-site",
+            "Origin": "https://www.perplexity.ai",
+            "Referer": "https://www.perplexity.ai/"
+        }
+
+    def _build_payload(self, prompt: str, system_message: Optional[str] = None, stream: bool = False) -> Dict[str, Any]:
+        """Build the chat completion payload for a single prompt."""
+        messages = []
+        if system_message:
+            messages.append({"role": "system", "content": system_message})
+        messages.append({"role": "user", "content": prompt})
+
+        return {
+            "model": self.model,
+            "messages": messages,
+            "temperature": self.temperature,
+            "max_tokens": self._max_tokens_for(system_message),
+            "stream": stream
+        }
+
+    def _max_tokens_for(self, system_message: Optional[str]) -> int:
+        """max_tokens to request: headroom over recent output lengths for this system prompt, capped at max_tokens."""
+        history = self._output_lengths.get(system_message)
+        # Batched prompts answer several queries at once, so single-answer lengths don't apply
+        if self.prompt_batch_size > 1 or history is None or len(history) < MIN_LENGTH_HISTORY:
+            return self.max_tokens
+        p95 = statistics.quantiles(list(history), n=20)[-1]
+        return min(self.max_tokens, int(p95 * MAX_TOKENS_HEADROOM))
+
+    def _record_output_length(self, system_message: Optional[str], content: str, truncated: bool = False,
+                              usage: Optional[Dict[str, Any]] = None):
+        """Remember how long an answer was, preferring the provider's own token count."""
+        if truncated:
+            # Hit the requested limit: count it as a full-length answer so the limit grows back
+            tokens = self.max_tokens
+        else:
+            tokens = (usage or {}).get('completion_tokens') or len(content.split()) * 1.3
+        self._output_lengths.setdefault(system_message, deque(maxlen=64)).append(tokens)
+
+    def _cache_key(self, prompt: str, system_message: Optional[str]) -> str:
+        """SHA-256 key over everything that determines the response."""
+        return _gpt_cache.make_key(
+            _json_dumps({"m": self.model, "t": self.temperature, "mx": self.max_tokens, "s": system_message, "p": prompt}, sort_keys=True).decode('utf-8')
+        )
+
+    def _cached_response(self, key: str) -> Optional[str]:
+        """Return a still-fresh cached response for key, if caching is enabled."""
+        if not self.use_cache:
+            return None
+        return _gpt_cache.get(key, namespace=CACHE_NAMESPACE, max_age=CACHE_MAX_AGE)
+
+    def _store_response(self, key: str, content: Optional[str]):
+        """Cache a successful response."""
+        if self.use_cache and content:
+            _gpt_cache.put(key, content, namespace=CACHE_NAMESPACE)
+
+    def _check_rate_limit(self, response):
+        """Feed the response's rate-limit headers to the limiter and raise RateLimited on a 429."""
+        if response.status_code == 429:
+            delay = self.limiter.backoff(response.headers)
+            self.logger.warning("Rate limit exceeded (Retry-After %.0fs)", delay)
+            raise RateLimited(response)
+        self.limiter.update_from_headers(response.headers)
+        return response
+
+    def _post(self, payload: Dict[str, Any], stream: bool = False):
+        """Send one request over the pooled session, paced by the limiter."""
+        self.limiter.acquire()
+        response = self.session.post(
+            self.base_url,
+            data=_json_dumps(payload),  # Content-Type is set on the session
+            timeout=120,  # Longer timeout
+            verify=True,  # Ensure SSL verification
+            stream=stream
+        )
+        try:
+            return self._check_rate_limit(response)
+        except RateLimited:
+            # A streamed 429 would otherwise hold its pooled connection until garbage-collected
+            response.close()
+            raise
+
+    async def _post_async(self, client: httpx.AsyncClient, payload: Dict[str, Any]):
+        """Async variant of _post over a shared client."""
+        await self.limiter.acquire_async()
+        return self._check_rate_limit(await client.post(self.base_url, content=_json_dumps(payload)))
+
+    def _parse_response(self, response, system_message: Optional[str] = None) -> Optional[str]:
+        """Extract the completion text from a requests/httpx response (429 is handled by the caller)."""
+        self.logger.info("Response status: %s", response.status_code)
+        self.logger.debug("Content-Encoding: %s", response.headers.get("Content-Encoding"))
+
+        if response.status_code == 200:
+            self.breaker.record_success()
+            result = _json_loads(response.content)
+            if 'choices' in result and len(result['choices']) > 0:
+                choice = result['choices'][0]
+                content = choice['message']['content']
+                if content:
+                    self._record_output_length(system_message, content, choice.get('finish_reason') == 'length', result.get('usage'))
+                return content
+            else:
+                self.logger.error("Unexpected response format: %s", result)
+                return None
+        elif response.status_code == 401:
+            self.logger.error("Authentication failed. Please check your Perplexity API key.")
+            return None
+        elif response.status_code == 403:
+            self._record_failure("Perplexity access blocked by Cloudflare")
+            return None
+        else:
+            if response.status_code >= 500:
+                self.breaker.record_failure()
+            self.logger.error("Perplexity API error: %s", response.status_code)
+            try:
+                error_data = response.json()
+                self.logger.error("Error details: %s", error_data)
+            except:
+                self.logger.error("Error response: %s", response.text[:500])
+            return None
+
+    def _record_failure(self, reason: str):
+        """Count a failure towards the circuit breaker and log whether it has now opened."""
+        self.breaker.record_failure()
+        if self.breaker.state == CircuitBreaker.OPEN:
+            self.logger.warning("%s - Perplexity disabled for %.0fs after %s failures", reason, self.breaker.half_open_after, self.breaker.failures)
+        else:
+            self.logger.warning("%s (failure %s/%s)", reason, self.breaker.failures, self.breaker.max_failures)
+
+    def generate_response(self, prompt: str, system_message: Optional[str] = None, cancel: Optional[threading.Event] = None) -> Optional[str]:
         """Generate a response from Perplexity API with enhanced headers and error handling."""
         # Skip if we're already blocked
         if self.is_blocked:
             self.logger.debug("Skipping Perplexity request - service is blocked")
             return None
 
+        key = self._cache_key(prompt, system_message)
+        cached = self._cached_response(key)
+        if cached is not None:
+            return cached
+
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            # Same request already running on another thread: wait for its answer
+            return future.result()
+
         try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                "Accept-Language": "en-US,en;q=0.9",
-                "Accept-Encoding": "gzip, deflate, br",
-                "Cache-Control": "no-cache",
-                "Pragma": "no-cache",
-                "Sec-Ch-Ua": '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"',
-                "Sec-Ch-Ua-Mobile": "?0",
-                "Sec-Ch-Ua-Platform": '"Windows"',
-                "Sec-Fetch-Dest": "empty",
-                "Sec-Fetch-Mode": "cors",
-                "Sec-Fetch-Site": "cross-site",
-                "Origin": "https://www.perplexity.ai",
-                "Referer": "https://www.perplexity.ai/"
-            }
+            content = self._request(key, prompt, system_message, cancel)
+            future.set_result(content)
+            return content
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+
+    def _request(self, key: str, prompt: str, system_message: Optional[str], cancel: Optional[threading.Event] = None) -> Optional[str]:
+        """Send a request (with retries), parse it and cache the answer."""
+        if not self.breaker.allow():
+            self.logger.debug("Skipping Perplexity request - service is blocked")
+            return None
 
-            messages = []
-            if system_message:
-                messages.append({"role": "system", "content": system_message})
-            messages.append({"role": "user", "content": prompt})
-
-            payload = {
-                "model": self.model,
-                "messages": messages,
-                "temperature": self.temperature,
-                "max_tokens": self.max_tokens,
-                "stream": False
-            }
+        try:
+            # Streamed and collected: the same request generate_response_stream makes, joined into one string
+            payload = self._build_payload(prompt, system_message, stream=True)
 
-            self.logger.info(f"Making request to {self.base_url} with enhanced headers")
-
-            # Use session for connection reuse
-            session = requests.Session()
-            session.headers.update(headers)
-
-            response = session.post(
-                self.base_url,
-                json=payload,
-                timeout=120,  # Longer timeout
-                verify=True   # Ensure SSL verification
-            )
-
-            # Add random delay to avoid bot detection
-            import random
-            delay = self.rate_limit_delay + random.uniform(0.5, 2.0)
-            time.sleep(delay)
-
-            self.logger.info(f"Response status: {response.status_code}")
-
-            if response.status_code == 200:
-                # Reset failure count on success
-                self.consecutive_failures = 0
-                result = response.json()
-                if 'choices' in result and len(result['choices']) > 0:
-                    return result['choices'][0]['message']['content']
-                else:
-                    self.logger.error(f"Unexpected response format: {result}")
-                    return None
-            elif response.status_code == 401:
-                self.logger.error("Authentication failed. Please check your Perplexity API key.")
-                return None
-            elif response.status_code == 403:
-                self.consecutive_failures += 1
-                if self.consecutive_failures >= self.max_failures:
-                    self.is_blocked = True
-                    self.logger.warning(f"Perplexity blocked after {self.consecutive_failures} failures - disabling for this session")
-                else:
-                    self.logger.warning(f"Perplexity access blocked by Cloudflare (failure {self.consecutive_failures}/{self.max_failures})")
-                return None
-            elif response.status_code == 429:
-                self.logger.warning("Rate limit exceeded. Waiting 60 seconds...")
-                time.sleep(60)
-                return self.generate_response(prompt, system_message)
-            else:
-                self.logger.error(f"Perplexity API error: {response.status_code}")
-                try:
-                    error_data = response.json()
-                    self.logger.error(f"Error details: {error_data}")
-                except:
-                    self.logger.error(f"Error response: {response.text[:500]}")
+            self.logger.info("Making request to %s with enhanced headers", self.base_url)
+
+            response = with_retry(lambda: self._post(payload, stream=True), RETRYABLE_ERRORS, cancel=cancel)
+
+            with response:
+                if response.status_code != 200:
+                    # Logs the error and tracks Cloudflare blocks
+                    return self._parse_response(response, system_message=system_message)
+                self.breaker.record_success()
+                meta: Dict[str, Any] = {}
+                content = ''.join(self._iter_deltas(response, meta))
+
+            if not content:
+                self.logger.error("Unexpected response format: stream carried no content")
                 return None
+            self._record_output_length(system_message, content, meta.get('finish_reason') == 'length', meta.get('usage'))
+            self._store_response(key, content)
+            return content
 
+        except RateLimited:
+            self.logger.error("Rate limit still exceeded after retries - giving up on this request")
+            return None
         except requests.exceptions.RequestException as e:
-            self.logger.error(f"Request error: {e}")
+            self._record_failure(f"Request error: {e}")
             return None
         except Exception as e:
-            self.logger.error(f"Unexpected error: {e}")
+            self.logger.error("Unexpected error: %s", e)
             return None
 
-    def generate_queries(self, business_name: str, business_url: str, business_location: str, num_consumer: int, num_business: int, prompt_template: str = None) -> Optional[str]:
-        """Generate queries for business visibility testing."""
-        if prompt_template:
-            # Use provided template with variable substitution
-            prompt = prompt_template.format(
-                total_queries=num_consumer + num_business,
-                business_name=business_name,
-                business_url=business_url,
-                business_location=business_location,
-                num_consumer=num_consumer,
-                num_business=num_business
-            )
-        else:
-            # Fallback to simple prompt
-            prompt = f"""Generate {num_consumer + num_business} realistic search queries to test AI visibility for {business_name} ({business_url}) operating in {business_location}.
+    async def generate_response_async(self, client: httpx.AsyncClient, prompt: str, system_message: Optional[str] = None) -> Optional[str]:
+        """Generate a response over a shared async HTTP/2 client."""
+        if self.is_blocked:
+            self.logger.debug("Skipping Perplexity request - service is blocked")
+            return None
 
-Create exactly {num_consumer} consumer-focused queries and {num_business} business-focused queries.
+        key = self._cache_key(prompt, system_message)
+        cached = self._cached_response(key)
+        if cached is not None:
+            return cached
 
-CONSUMER QUERIES ({num_consumer}):
-- Questions a customer might ask when they have a problem that {business_name} could solve
-- Should NOT mention {business_name} directly
-- Should be natural, conversational questions
-- Examples: "My car suspension is bouncing on rough roads", "Where can I get quality suspension upgrades?"
+        future = self._inflight_async.get(key)
+        if future is not None:
+            # Shielded so a cancelled duplicate does not cancel the request it is waiting on
+            return await asyncio.shield(future)
 
-BUSINESS QUERIES ({num_business}):
-- Questions someone might ask when specifically researching {business_name}
-- Can mention the business name or ask for comparisons
-- Examples: "What do people think about {business_name}?", "Is {business_name} better than competitors?"
+        future = self._inflight_async[key] = asyncio.get_running_loop().create_future()
+        try:
+            content = await self._request_async(client, key, prompt, system_message)
+            future.set_result(content)
+            return content
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            del self._inflight_async[key]
+
+    async def _request_async(self, client: httpx.AsyncClient, key: str, prompt: str, system_message: Optional[str]) -> Optional[str]:
+        """Async variant of _request over a shared client."""
+        if not self.breaker.allow():
+            self.logger.debug("Skipping Perplexity request - service is blocked")
+            return None
 
-Format your response as a numbered list with exactly {num_consumer + num_business} queries total.
-Make sure each query is self-contained and doesn't require additional context."""
+        try:
+            payload = self._build_payload(prompt, system_message)
+            response = await with_retry_async(lambda: self._post_async(client, payload), ASYNC_RETRYABLE_ERRORS)
 
-        system_message = "You are an expert at generating realistic search queries for business visibility testing. Create diverse, natural queries that real users would ask."
+            content = self._parse_response(response, system_message=system_message)
+            self._store_response(key, content)
+            return content
 
-        return self.generate_response(prompt, system_message)
+        except RateLimited:
+            self.logger.error("Rate limit still exceeded after retries - giving up on this request")
+            return None
+        except httpx.HTTPError as e:
+            self._record_failure(f"Request error: {e}")
+            return None
+        except Exception as e:
+            self.logger.error("Unexpected error: %s", e)
+            return None
+
+    def generate_queries(self, business_name: str, business_url: str, business_location: str, num_consumer: int, num_business: int, prompt_template: str = None) -> Optional[str]:
+        """Generate queries for business visibility testing."""
+        # A fresh event per call, so a cancel() aimed at this call never leaks into later requests
+        self._cancel = cancel = threading.Event()
+        prompt = build_query_prompt(business_name, business_url, business_location, num_consumer, num_business, prompt_template)
+        return self.generate_response(prompt, QUERY_SYSTEM_MESSAGE, cancel=cancel)
+
+    def generate_response_stream(self, prompt: str, system_message: Optional[str] = None) -> Iterator[str]:
+        """Yield the response text piece by piece as Perplexity streams it (server-sent events).
+
+        The caller may stop iterating early, e.g. once a batched JSON answer array is complete;
+        the connection is released either way. Only a fully read stream is cached.
+        """
+        if self.is_blocked:
+            self.logger.debug("Skipping Perplexity request - service is blocked")
+            return
+
+        key = self._cache_key(prompt, system_message)
+        cached = self._cached_response(key)
+        if cached is not None:
+            yield cached
+            return
+        if not self.breaker.allow():
+            return
+
+        payload = self._build_payload(prompt, system_message, stream=True)
+        try:
+            response = with_retry(lambda: self._post(payload, stream=True), RETRYABLE_ERRORS)
+        except RateLimited:
+            self.logger.error("Rate limit still exceeded after retries - giving up on this request")
+            return
+        except requests.exceptions.RequestException as e:
+            self._record_failure(f"Request error: {e}")
+            return
+
+        with response:
+            if response.status_code != 200:
+                # Logs the error and tracks Cloudflare blocks
+                self._parse_response(response)
+                return
+            self.breaker.record_success()
+
+            parts = []
+            meta: Dict[str, Any] = {}
+            for delta in self._iter_deltas(response, meta):
+                parts.append(delta)
+                yield delta
+
+        content = ''.join(parts)
+        if content:
+            self._record_output_length(system_message, content, meta.get('finish_reason') == 'length', meta.get('usage'))
+        self._store_response(key, content)
+
+    def _iter_deltas(self, response, meta: Dict[str, Any]) -> Iterator[str]:
+        """Yield the content deltas of a streamed (SSE) completion; finish_reason and usage are stored in meta."""
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith('data:'):
+                continue
+            data = line[len('data:'):].strip()
+            if data == '[DONE]':
+                break
+            try:
+                event = _json_loads(data)
+            except ValueError:
+                continue
+            if event.get('usage'):
+                meta['usage'] = event['usage']
+            choices = event.get('choices') or []
+            if not choices:
+                continue
+            if choices[0].get('finish_reason'):
+                meta['finish_reason'] = choices[0]['finish_reason']
+            delta = choices[0].get('delta', {}).get('content')
+            if delta:
+                yield delta
 
     def get_ai_response(self, query: str) -> Optional[str]:
         """Get AI response to a query using standard prompt."""
         return self.generate_response(query, self.standard_prompt)
 
+    def _batch_prompt(self, batch: List[Dict[str, Any]]) -> str:
+        """Build one prompt asking for independent answers to several queries."""
+        return (
+            "Answer each of the following queries independently, as if it were asked on its own.\n"
+            'Return ONLY a JSON array of {"id": <query id>, "answer": <answer text>} objects, one per query.\n\n'
+            f"Queries: {_json_dumps(batch).decode('utf-8')}"
+        )
+
+    def _parse_batch_answers(self, response: Optional[str], ids: List[int]) -> Optional[Dict[int, str]]:
+        """Map query id to answer from a batched response, or None unless every id was answered."""
+        if not response:
+            return None
+        try:
+            items = _json_loads(JSON_FENCE_RE.sub('', response))
+            answers = {int(item['id']): item['answer'] for item in items if item.get('answer')}
+        except (ValueError, TypeError, KeyError, AttributeError):
+            return None
+        return answers if all(query_id in answers for query_id in ids) else None
+
     def get_multiple_responses(self, queries: List[str], progress_callback=None) -> List[Dict[str, Any]]:
         """Get AI responses for multiple queries with optimized parallel processing."""
-        from concurrent.futures import ThreadPoolExecutor, as_completed
+        return asyncio.run(self.get_multiple_responses_async(queries, progress_callback))
 
-        results = []
-        batch_size = 5  # Process 5 queries in parallel
+    async def get_multiple_responses_async(self, queries: List[str], progress_callback=None) -> List[Dict[str, Any]]:
+        """Fan all queries out over one HTTP/2 connection, bounded by max_concurrent in-flight requests.
 
-        def process_single_query(query_data):
-            idx, query = query_data
-            response = self.get_ai_response(query)
-            return {
+        With prompt_batch_size > 1, each request answers that many queries and falls back to
+        one request per query if the batched reply can't be parsed.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+        completed = 0
+        results: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+
+        def record(idx: int, response: Optional[str]):
+            nonlocal completed
+            results[idx] = {
                 'query_id': idx + 1,
-                'query_text': query,
+                'query_text': queries[idx],
                 'response_text': response or "ERROR: Failed to get response",
                 'provider': self.provider
             }
-
-        # Process queries in batches to avoid overwhelming the API
-        total_processed = 0
-        for i in range(0, len(queries), batch_size):
-            batch_queries = [(idx, query) for idx, query in enumerate(queries[i:i + batch_size], start=i)]
-
-            with ThreadPoolExecutor(max_workers=min(3, len(batch_queries))) as executor:
-                # Submit all queries in the batch
-                future_to_query = {executor.submit(process_single_query, query_data): query_data for query_data in batch_queries}
-
-                # Collect results as they complete
-                batch_results = []
-                for future in as_completed(future_to_query):
-                    try:
-                        result = future.result()
-                        batch_results.append(result)
-                        total_processed += 1
-
-                        if progress_callback:
-                            progress_callback(total_processed, len(queries))
-
-                        # Short delay to avoid rate limiting
-                        time.sleep(0.5)
-                    except Exception as e:
-                        query_data = future_to_query[future]
-                        print(f"Error processing query {query_data[0]}: {e}")
-                        batch_results.append({
-                            'query_id': query_data[0] + 1,
-                            'query_text': query_data[1],
-                            'response_text': f"ERROR: {str(e)}",
-                            'provider': self.provider
-                        })
-
-                # Sort batch results by query_id to maintain order
-                batch_results.sort(key=lambda x: x['query_id'])
-                results.extend(batch_results)
-
-            # Pause between batches to be respectful to the API
-            if i + batch_size < len(queries):
-                time.sleep(1)
-
-        return results
\ No newline at end of file
+            completed += 1
+            if progress_callback:
+                progress_callback(completed, len(queries))
+
+        async def ask(prompt: str) -> Optional[str]:
+            async with semaphore:
+                return await self.generate_response_async(client, prompt, self.standard_prompt)
+
+        async def process_query(idx: int):
+            record(idx, await ask(queries[idx]))
+
+        async def process_batch(indices: List[int]):
+            if len(indices) > 1:
+                batch = [{"id": idx + 1, "query": queries[idx]} for idx in indices]
+                answers = self._parse_batch_answers(await ask(self._batch_prompt(batch)), [idx + 1 for idx in indices])
+                if answers is not None:
+                    for idx in indices:
+                        record(idx, answers[idx + 1])
+                    return
+                self.logger.warning("Could not parse batched answers for queries %s-%s, asking one by one", indices[0] + 1, indices[-1] + 1)
+            await asyncio.gather(*(process_query(idx) for idx in indices))
+
+        batch_size = max(1, self.prompt_batch_size)
+        batches = [list(range(start, min(start + batch_size, len(queries)))) for start in range(0, len(queries), batch_size)]
+
+        # The client's connection pool is bound to the running event loop, so it lives for one run
+        limits = httpx.Limits(max_connections=self.max_concurrent)
+        async with httpx.AsyncClient(http2=True, headers=self._headers, timeout=120, limits=limits) as client:
+            await asyncio.gather(*(process_batch(indices) for indices in batches))
+        return results
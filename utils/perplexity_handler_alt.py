@@ -4,12 +4,68 @@ Alternative Perplexity handler using httpx and HTTP/2 to bypass Cloudflare.
 """
 
 import httpx
+import ssl
 import asyncio
-import time
+import threading
 import random
-from typing import Optional, List, Dict, Any
+from typing import Optional, List
 import logging
 
+from .query_result import QueryResult
+
+# Try using ijson to decode responses as they arrive instead of buffering the whole body
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    IJSON_AVAILABLE = False
+
+# httpx can only decode br responses when brotli is installed
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+# One verifying TLS context for every client, so it is built once and TLS sessions can be resumed on reconnect
+_SSL_CTX = ssl.create_default_context()
+_SSL_CTX.set_alpn_protocols(["h2", "http/1.1"])
+
+# More realistic browser headers, identical for every handler; only Authorization differs
+_BASE_HEADERS = {
+    "Content-Type": "application/json",
+    "Accept": "application/json, text/plain, */*",
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept-Encoding": ACCEPT_ENCODING,
+    "Cache-Control": "no-cache",
+    "Pragma": "no-cache",
+    "Sec-Ch-Ua": '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"',
+    "Sec-Ch-Ua-Mobile": "?0",
+    "Sec-Ch-Ua-Platform": '"Windows"',
+    "Sec-Fetch-Dest": "empty",
+    "Sec-Fetch-Mode": "cors",
+    "Sec-Fetch-Site": "cross-site",
+    "X-Requested-With": "XMLHttpRequest"
+}
+
+async def _decode_content(chunks) -> Optional[str]:
+    """Stream-decode a chat completion body and return the first choice's message content.
+
+    Only the answer text is kept, so peak memory is that text rather than the raw body plus its parse.
+    """
+    events = ijson.sendable_list()
+    parser = ijson.parse_coro(events)
+    async for chunk in chunks:
+        parser.send(chunk)
+        for prefix, _, value in events:
+            if prefix == 'choices.item.message.content':
+                # Nothing after the first answer is needed; leaving early closes the stream
+                return value
+        del events[:]
+    parser.close()
+    return None
+
 class PerplexityHandlerAlt:
     def __init__(self, api_key: str, model: str = "llama-3.1-sonar-large-128k-online"):
         self.api_key = api_key
@@ -18,31 +74,71 @@ class PerplexityHandlerAlt:
         self.temperature = 0.7
         self.max_tokens = 2000
         self.rate_limit_delay = 1.5
+        self.max_concurrent = 5  # Requests in flight at once in get_multiple_responses
+        # Backoff state: requests go out immediately until a 429/403, then wait exponentially longer per
+        # consecutive refusal. Per-handler RNG for the jitter, so concurrent callers don't share the global random lock
+        self._rng = random.Random()
+        self._consecutive_errors = 0
+        self._resume_at = 0.0
         self.provider = "perplexity"
         self.logger = logging.getLogger(__name__)
 
+        self._auth_header = {"Authorization": f"Bearer {self.api_key}"}
+
+        # One HTTP/2 client reused across calls so the connection and its HPACK table persist
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # Persistent event loop on a background thread for the sync entry points, so the client above
+        # stays on the loop that opened its connections
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, name="perplexity-alt-loop", daemon=True)
+        self._loop_thread.start()
+
+    async def _get_client(self) -> httpx.AsyncClient:
+        """Return the shared client, creating it on first use (or if the event loop changed)."""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            transport = httpx.AsyncHTTPTransport(
+                http2=True,
+                retries=2,  # Retries failed connection attempts only, never a sent request
+                verify=_SSL_CTX,
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=100)
+            )
+            self._client = httpx.AsyncClient(
+                transport=transport,
+                timeout=httpx.Timeout(30.0, connect=5.0),
+                # Set once on the client so the whole session's connections reuse them (and their HPACK entries)
+                headers={**_BASE_HEADERS, **self._auth_header}
+            )
+            self._client_loop = loop
+        return self._client
+
+    async def aclose(self):
+        """Close the shared client."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def close(self):
+        """Close the client and stop the background event loop."""
+        if self._loop.is_closed():
+            return
+        if self._client_loop is self._loop:
+            self._run(self.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join()
+        self._loop.close()
+
+    def __del__(self):
+        # Only signal the loop to stop; joining here could hang during interpreter shutdown
+        loop = getattr(self, '_loop', None)
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(loop.stop)
+
     async def generate_response_async(self, prompt: str, system_message: Optional[str] = None) -> Optional[str]:
         """Generate response using httpx with HTTP/2."""
         try:
-            # More realistic browser headers
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-                "Accept": "application/json, text/plain, */*",
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                "Accept-Language": "en-US,en;q=0.9",
-                "Accept-Encoding": "gzip, deflate, br",
-                "Cache-Control": "no-cache",
-                "Pragma": "no-cache",
-                "Sec-Ch-Ua": '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"',
-                "Sec-Ch-Ua-Mobile": "?0",
-                "Sec-Ch-Ua-Platform": '"Windows"',
-                "Sec-Fetch-Dest": "empty",
-                "Sec-Fetch-Mode": "cors",
-                "Sec-Fetch-Site": "cross-site",
-                "X-Requested-With": "XMLHttpRequest"
-            }
-
             messages = []
             if system_message:
                 messages.append({"role": "system", "content": system_message})
@@ -56,70 +152,89 @@ class PerplexityHandlerAlt:
                 "stream": False
             }
 
-            # Use HTTP/2 client
-            async with httpx.AsyncClient(http2=True, timeout=30.0, verify=False) as client:
-                # Add random delay
-                await asyncio.sleep(random.uniform(0.5, 2.0))
-
-                response = await client.post(
-                    self.base_url,
-                    headers=headers,
-                    json=payload
-                )
-
-                self.logger.info(f"Response status: {response.status_code}")
-
-                if response.status_code == 200:
-                    result = response.json()
-                    if 'choices' in result and len(result['choices']) > 0:
-                        return result['choices'][0]['message']['content']
-                    else:
-                        self.logger.error(f"Unexpected response format: {result}")
-                        return None
-                elif response.status_code == 403:
-                    self.logger.error("403 Forbidden - Cloudflare protection active")
-                    return None
+            client = await self._get_client()
+
+            await self._wait_for_backoff()
+            async with client.stream("POST", self.base_url, json=payload) as response:
+                self.logger.info("Response status: %s", response.status_code)
+                self.logger.debug("Content-Encoding: %s", response.headers.get("Content-Encoding"))
+
+                if response.status_code in (403, 429):
+                    self._back_off()
                 else:
-                    self.logger.error(f"API error {response.status_code}: {response.text}")
+                    self._consecutive_errors = 0
+
+                if response.status_code == 200 and IJSON_AVAILABLE:
+                    content = await _decode_content(response.aiter_bytes())
+                    if content is None:
+                        self.logger.error("Unexpected response format: no choices[0].message.content")
+                    return content
+
+                # Without ijson, and for error bodies, read the whole response
+                await response.aread()
+
+            if response.status_code == 200:
+                result = response.json()
+                if 'choices' in result and len(result['choices']) > 0:
+                    return result['choices'][0]['message']['content']
+                else:
+                    self.logger.error("Unexpected response format: %s", result)
                     return None
+            elif response.status_code == 403:
+                self.logger.error("403 Forbidden - Cloudflare protection active")
+                return None
+            else:
+                self.logger.error("API error %s: %s", response.status_code, response.text)
+                return None
 
         except Exception as e:
-            self.logger.error(f"Error calling Perplexity API: {e}")
+            self.logger.error("Error calling Perplexity API: %s", e)
             return None
 
+    async def _wait_for_backoff(self):
+        """Hold the request back until any pending backoff has passed."""
+        delay = self._resume_at - asyncio.get_running_loop().time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _back_off(self):
+        """Delay further requests by 0.5s * 2^n (capped at 60s) plus up to 1s jitter after the n-th refusal in a row."""
+        delay = min(60.0, 0.5 * 2 ** self._consecutive_errors) + self._rng.random()
+        self._consecutive_errors += 1
+        self._resume_at = max(self._resume_at, asyncio.get_running_loop().time() + delay)
+        self.logger.warning("Perplexity refused the request, backing off %.1fs", delay)
+
+    def _run(self, coro):
+        """Run a coroutine on the handler's event loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
     def generate_response(self, prompt: str, system_message: Optional[str] = None) -> Optional[str]:
         """Sync wrapper for async method."""
-        try:
-            loop = asyncio.get_event_loop()
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-
-        return loop.run_until_complete(self.generate_response_async(prompt, system_message))
+        return self._run(self.generate_response_async(prompt, system_message))
 
     def get_ai_response(self, query: str) -> Optional[str]:
         """Get AI response using standard prompt."""
         return self.generate_response(query)
 
-    def get_multiple_responses(self, queries: List[str], progress_callback=None) -> List[Dict[str, Any]]:
-        """Get responses with slower, more human-like timing."""
-        results = []
+    def get_multiple_responses(self, queries: List[str], progress_callback=None) -> List[QueryResult]:
+        """Get responses for all queries concurrently."""
+        return self._run(self.get_multiple_responses_async(queries, progress_callback))
+
+    async def get_multiple_responses_async(self, queries: List[str], progress_callback=None) -> List[QueryResult]:
+        """Dispatch every query at once as multiplexed HTTP/2 streams, bounded by max_concurrent in flight."""
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+        completed = 0
 
-        for idx, query in enumerate(queries):
-            # Add longer, more random delays
-            if idx > 0:
-                delay = random.uniform(3, 8)  # 3-8 seconds between requests
-                time.sleep(delay)
+        async def process_query(idx: int, query: str) -> QueryResult:
+            nonlocal completed
+            async with semaphore:
+                response = await self.generate_response_async(query)
 
-            response = self.get_ai_response(query)
+            completed += 1
             if progress_callback:
-                progress_callback(idx + 1, len(queries))
+                progress_callback(completed, len(queries))
 
-            results.append({
-                'query_id': idx + 1,
-                'query_text': query,
-                'response_text': response or "ERROR: Failed to get response",
-                'provider': self.provider
-            })
+            return QueryResult(idx + 1, query, response or "ERROR: Failed to get response", self.provider)
 
-        return results
\ No newline at end of file
+        # gather keeps query order regardless of completion order
+        return await asyncio.gather(*(process_query(idx, query) for idx, query in enumerate(queries)))
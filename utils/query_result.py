@@ -0,0 +1,31 @@
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Dict
+
+@dataclass(slots=True)
+class QueryResult:
+    """One answered query. Slots keep large batches far smaller than one dict per record.
+
+    Subscripting and get() still work, so code written against the old dict records
+    (result['response_text'], result.get('provider')) keeps working unchanged.
+    """
+
+    query_id: int
+    query_text: str
+    response_text: str
+    provider: str
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default)
+
+    def keys(self):
+        return [f.name for f in fields(self)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain dict copy, e.g. for json.dump."""
+        return asdict(self)
@@ -0,0 +1,127 @@
+import re
+import time
+import asyncio
+import threading
+from typing import Mapping, Optional
+
+class TokenBucket:
+    """Token-bucket rate limiter: allows bursts of up to `burst` requests, refilled at `rate` tokens per second."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take one token and return how long the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Going negative queues callers behind each other instead of letting them race for the next token
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self):
+        """Block only if the bucket is empty."""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Async variant of acquire that yields to the event loop while waiting."""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+# Durations in rate-limit reset headers, e.g. "1s", "6m0s", "20ms"
+DURATION_RE = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+def _parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After / x-ratelimit-reset value into seconds."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = DURATION_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+class AdaptiveLimiter:
+    """Request pacer whose rate follows the provider's rate-limit headers.
+
+    Without headers it falls back to AIMD: the rate creeps up by one request per minute on
+    each success and halves whenever the provider answers 429.
+    """
+
+    def __init__(self, default_rpm: float = 60, min_rpm: float = 1, max_rpm: Optional[float] = None):
+        self.min_rpm = min_rpm
+        self.max_rpm = max_rpm or default_rpm * 10
+        self.rpm = default_rpm
+        self._bucket = TokenBucket(rate=default_rpm / 60, burst=1)
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+
+    def _set_rpm(self, rpm: float):
+        self.rpm = min(self.max_rpm, max(self.min_rpm, rpm))
+        self._bucket.rate = self.rpm / 60
+
+    def _pause_for(self, seconds: float):
+        """Hold every caller back until the provider's window resets."""
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+    def _paused_wait(self) -> float:
+        return max(0.0, self._resume_at - time.monotonic())
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        wait = self._paused_wait()
+        if wait > 0:
+            time.sleep(wait)
+        self._bucket.acquire()
+
+    async def acquire_async(self):
+        """Async variant of acquire that yields to the event loop while waiting."""
+        wait = self._paused_wait()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        await self._bucket.acquire_async()
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """Adjust the pace after a successful response from its x-ratelimit-* headers."""
+        remaining = headers.get('x-ratelimit-remaining-requests')
+        limit = headers.get('x-ratelimit-limit-requests')
+        try:
+            remaining = int(remaining) if remaining is not None else None
+            limit = int(limit) if limit is not None else None
+        except ValueError:
+            remaining = limit = None
+
+        if remaining is None:
+            # No header guidance: additive increase
+            self._set_rpm(self.rpm + 1)
+            return
+
+        if remaining == 0:
+            self._pause_for(_parse_duration(headers.get('x-ratelimit-reset-requests')) or 1.0)
+        elif limit and remaining < limit * 0.1:
+            # Nearly out of budget: back off before the provider has to refuse us
+            self._set_rpm(self.rpm / 2)
+        else:
+            self._set_rpm(min(self.rpm + 1, limit) if limit else self.rpm + 1)
+
+    def backoff(self, headers: Mapping[str, str], default: float = 60.0) -> float:
+        """Record a 429: halve the rate, pause all callers and return how long this caller should wait."""
+        self._set_rpm(self.rpm / 2)
+        delay = _parse_duration(headers.get('retry-after'))
+        if delay is None:
+            delay = default
+        self._pause_for(delay)
+        return delay
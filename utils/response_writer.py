@@ -0,0 +1,67 @@
+import csv
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+class ResponseWriter:
+    """Write query results to a responses CSV on a background thread while they are still being collected."""
+
+    FIELDNAMES = ['Query ID', 'Query Text', 'Provider', 'Response Text']
+
+    def __init__(self, output_path: str, flush_threshold: int = 256):
+        self.output_path = output_path
+        self.flush_threshold = flush_threshold
+        self.rows_written = 0
+        # Double buffer: the producer fills one list while the writer thread flushes the other
+        self._buffers: List[List[Dict[str, Any]]] = [[], []]
+        self._active = 0
+        self._pending: Optional[Future] = None
+        self._executor = None
+        self._file = None
+        self._writer = None
+        self._error: Optional[BaseException] = None
+
+    def __enter__(self) -> "ResponseWriter":
+        # Large buffer so long response rows are flushed in few write() calls
+        self._file = open(self.output_path, 'w', newline='', encoding='utf-8', buffering=1 << 20)
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(self.FIELDNAMES)
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="response-writer")
+        return self
+
+    def write(self, result: Dict[str, Any]):
+        """Buffer one result row; blocks only if the previous flush is still running when this buffer fills."""
+        buffer = self._buffers[self._active]
+        buffer.append(result)
+        if len(buffer) >= self.flush_threshold:
+            self._swap()
+
+    def _swap(self):
+        # Single slot: wait for the other buffer to be flushed before handing this one over
+        if self._pending is not None:
+            self._pending.result()
+        self._pending = self._executor.submit(self._flush, self._buffers[self._active])
+        self._active ^= 1
+
+    def _flush(self, rows: List[Dict[str, Any]]):
+        # After a failure keep accepting buffers so producers never block, but stop writing
+        if self._error is None:
+            try:
+                self._writer.writerows([
+                    [result['query_id'], result['query_text'], result['provider'], result['response_text']]
+                    for result in rows
+                ])
+                self.rows_written += len(rows)
+            except Exception as e:
+                self._error = e
+        rows.clear()
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._buffers[self._active]:
+            self._swap()
+        self._executor.shutdown(wait=True)
+        self._file.close()
+
+        if self._error is not None and exc_type is None:
+            raise self._error
+        return False
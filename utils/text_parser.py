@@ -1,7 +1,42 @@
 import re
-from typing import List, Tuple, Dict, Any
+import sys
+import functools
+from typing import Iterator, List, Optional
 import logging
 
+from .query_result import QueryResult
+
+# Strong business indicators (fleet, company operations, bulk pricing, etc.)
+STRONG_BUSINESS_KEYWORDS = [
+    "fleet", "company", "business", "bulk pricing", "contractor",
+    "logistics", "rental fleet", "mining", "construction company",
+    "service agreements", "warranty support", "ongoing service",
+    "scalable", "ROI", "extended warranty", "refurbishment programs"
+]
+
+# Weaker business indicators that might appear in consumer queries
+WEAK_BUSINESS_KEYWORDS = [
+    "review", "opinion", "think about", "better than", "compare",
+    "vs", "versus", "service"
+]
+
+# Queries file: one query per line; skips blank/comment lines and strips any "N. " numbering
+QUERY_LINE_PATTERN = re.compile(r'^[ \t]*(?!#|Total queries:)(?:\d+\.[ \t]+)?(\S.*?)[ \t]*$', re.MULTILINE)
+
+def load_queries(queries_path: str) -> List[str]:
+    """Read the queries from a queries file, in file order."""
+    with open(queries_path, 'r', encoding='utf-8') as f:
+        return QUERY_LINE_PATTERN.findall(f.read())
+
+def _keyword_alternation(keywords: List[str]) -> str:
+    """Regex alternation over keywords; all-caps acronyms like "ROI" only match as a whole, case-sensitive word."""
+    return '|'.join(rf'(?-i:\b{re.escape(k)}\b)' if k.isupper() else re.escape(k) for k in keywords)
+
+@functools.lru_cache(maxsize=128)
+def _business_matcher(business_name: str) -> re.Pattern:
+    """Case-insensitive matcher for a business name, compiled once per name across a batch."""
+    return re.compile(re.escape(business_name), re.IGNORECASE)
+
 class TextParser:
     def __init__(self):
         self.logger = logging.getLogger(__name__)
@@ -10,142 +45,105 @@ class TextParser:
 
     def _compile_patterns(self):
         """Pre-compile all regex patterns for better performance."""
-        self.numbered_item_pattern = re.compile(r'^\d+[\.\)]\s*(.+)$')
-        self.quote_pattern = re.compile(r'^["\'](.+)["\']$')
+        # A whole numbered-list line, e.g. '  3. "query"'; the quotes, if any, are left out of the group
+        self.numbered_line_pattern = re.compile(
+            r'^[^\S\n]*\d+[.)][^\S\n]*(?:["\'](?P<quoted>.+)["\']|(?P<plain>.+?))[^\S\n]*$', re.MULTILINE
+        )
         self.provider_split_pattern = re.compile(r'=== (\w+) RESPONSES ===')
-        self.query_pattern = re.compile(r'QUERY\s+(\d+):\s*(.+?)(?=\nRESPONSE|\n---|\Z)', re.DOTALL)
-        self.response_pattern = re.compile(r'RESPONSE\s+(\d+)\s*\([^)]+\):\s*(.+?)(?=\n---|\nQUERY|\Z)', re.DOTALL)
+        # Start of a QUERY or RESPONSE field; a field's text runs up to the next anchor, so no lazy
+        # quantifiers or lookaheads are needed. Multi-provider files add "(provider)" after the response number
+        self.section_anchor_pattern = re.compile(r'^(?:QUERY\s+(?P<query>\d+):|RESPONSE\s+(?P<response>\d+)(?:\s*\([^)]+\))?:)', re.MULTILINE)
+        self.protocol_pattern = re.compile(r'^https?://')
+        self.www_pattern = re.compile(r'^www\.')
+        # One alternation per keyword set, so a query is scanned once instead of once per keyword
+        # IGNORECASE saves lowercasing a copy of every query before the scan
+        self.strong_business_pattern = re.compile(_keyword_alternation(STRONG_BUSINESS_KEYWORDS), re.IGNORECASE)
+        self.weak_business_pattern = re.compile(_keyword_alternation(WEAK_BUSINESS_KEYWORDS), re.IGNORECASE)
+        self.business_phrase_pattern = re.compile(r'what do people think about|is X better than', re.IGNORECASE)
 
     def parse_queries_from_response(self, response: str) -> List[str]:
         """Parse numbered queries from Perplexity API response."""
         if not response:
             return []
 
+        # Section headers and other unnumbered lines simply don't match
         queries = []
-        lines = response.strip().split('\n')
-
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
+        for match in self.numbered_line_pattern.finditer(response):
+            query = (match.group('quoted') or match.group('plain')).strip()
+            # Skip template placeholders like [detailed, specific, self-contained query]
+            if query and not query.startswith('[') and not query.endswith(']'):
+                queries.append(query)
 
-            # Skip section headers
-            if line.startswith('##') or line.startswith('#'):
-                continue
-
-            # Match numbered list items using compiled pattern
-            match = self.numbered_item_pattern.match(line)
-            if match:
-                query = match.group(1).strip()
-                # Remove quotes if present using compiled pattern
-                quote_match = self.quote_pattern.match(query)
-                if quote_match:
-                    query = quote_match.group(1)
-                # Remove brackets if present [detailed, specific, self-contained query]
-                query = re.sub(r'^\[.*?\]$', '', query).strip()
-                if query and not query.startswith('[') and not query.endswith(']'):
-                    queries.append(query)
-
-        self.logger.info(f"Parsed {len(queries)} queries from response")
+        self.logger.info("Parsed %s queries from response", len(queries))
         return queries
 
-    def parse_responses_file(self, file_path: str) -> List[Dict[str, str]]:
+    def parse_responses_file(self, file_path: str) -> List[QueryResult]:
         """Parse query-response pairs from responses file (supports both single and multi-provider formats)."""
-        results = []
-
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-
-            # Check if this is a multi-provider format
-            if '=== ' in content and ' RESPONSES ===' in content:
-                results = self._parse_multi_provider_format(content)
-            else:
-                results = self._parse_single_provider_format(content)
-
-            self.logger.info(f"Parsed {len(results)} query-response pairs from {file_path}")
+            results = list(self.iter_responses_file(file_path))
+            self.logger.info("Parsed %s query-response pairs from %s", len(results), file_path)
             return results
 
         except Exception as e:
-            self.logger.error(f"Error parsing responses file: {e}")
+            self.logger.error("Error parsing responses file: %s", e)
             return []
 
-    def _parse_single_provider_format(self, content: str) -> List[Dict[str, str]]:
-        """Parse single provider format."""
-        results = []
-        sections = content.split('---')
-
-        query_pattern = r'QUERY\s+(\d+):\s*(.+?)(?=\nRESPONSE|\n---|\Z)'
-        response_pattern = r'RESPONSE\s+(\d+):\s*(.+?)(?=\n---|\nQUERY|\Z)'
-
-        for section in sections:
-            section = section.strip()
-            if not section:
+    def iter_responses_file(self, file_path: str) -> Iterator[QueryResult]:
+        """Yield query-response pairs one at a time while reading the file line by line.
+
+        Memory stays bounded by one QUERY/RESPONSE section, so prefer this over parse_responses_file
+        for large files. Sections after a "=== PROVIDER RESPONSES ===" header belong to that provider;
+        a file without headers is read as the single-provider format.
+        """
+        provider = 'unknown'
+        section: List[str] = []
+
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                header = self.provider_split_pattern.search(line)
+                if header or line.startswith('---'):
+                    record = self._parse_section(''.join(section), provider)
+                    if record:
+                        yield record
+                    section.clear()
+
+                    if header:
+                        # Interned so every record (across files too) shares one string per provider
+                        provider = sys.intern(header.group(1).lower())
+                    continue
+                section.append(line)
+
+        record = self._parse_section(''.join(section), provider)
+        if record:
+            yield record
+
+    def _parse_section(self, section: str, provider: str) -> Optional[QueryResult]:
+        """Parse one QUERY/RESPONSE section, or return None if either part is missing."""
+        anchors = list(self.section_anchor_pattern.finditer(section))
+        query = response = None
+
+        for anchor, next_anchor in zip(anchors, anchors[1:] + [None]):
+            text = section[anchor.end():next_anchor.start() if next_anchor else len(section)].strip()
+            if not text:
                 continue
+            # The first non-empty field of each kind wins
+            if anchor.group('query') is not None:
+                query = query or (anchor.group('query'), text)
+            else:
+                response = response or text
 
-            query_match = re.search(query_pattern, section, re.DOTALL)
-            response_match = re.search(response_pattern, section, re.DOTALL)
-
-            if query_match and response_match:
-                query_id = query_match.group(1)
-                query_text = query_match.group(2).strip()
-                response_text = response_match.group(2).strip()
-
-                results.append({
-                    'query_id': int(query_id),
-                    'query_text': query_text,
-                    'response_text': response_text,
-                    'provider': 'unknown'
-                })
-
-        return results
-
-    def _parse_multi_provider_format(self, content: str) -> List[Dict[str, str]]:
-        """Parse multi-provider format."""
-        results = []
-
-        # Split by provider sections using compiled pattern
-        provider_sections = self.provider_split_pattern.split(content)
-
-        for i in range(1, len(provider_sections), 2):
-            if i + 1 < len(provider_sections):
-                provider = provider_sections[i].lower()
-                provider_content = provider_sections[i + 1]
-
-                # Parse responses within this provider section
-                sections = provider_content.split('---')
-
-                for section in sections:
-                    section = section.strip()
-                    if not section:
-                        continue
-
-                    # Use compiled patterns
-                    query_match = self.query_pattern.search(section)
-                    response_match = self.response_pattern.search(section)
-
-                    if query_match and response_match:
-                        query_id = query_match.group(1)
-                        query_text = query_match.group(2).strip()
-                        response_text = response_match.group(2).strip()
-
-                        results.append({
-                            'query_id': int(query_id),
-                            'query_text': query_text,
-                            'response_text': response_text,
-                            'provider': provider
-                        })
+        if not query or response is None:
+            return None
 
-        return results
+        return QueryResult(int(query[0]), query[1], response, provider)
 
     def clean_text(self, text: str) -> str:
         """Clean and normalize text for analysis."""
         if not text:
             return ""
 
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text)
-        return text.strip()
+        # Collapse whitespace runs and trim; split() does this in one C pass without the regex engine
+        return ' '.join(text.split())
 
     def extract_domain_from_url(self, url: str) -> str:
         """Extract domain from URL for matching."""
@@ -153,9 +151,9 @@ class TextParser:
             return ""
 
         # Remove protocol
-        domain = re.sub(r'^https?://', '', url)
+        domain = self.protocol_pattern.sub('', url)
         # Remove www.
-        domain = re.sub(r'^www\.', '', domain)
+        domain = self.www_pattern.sub('', domain)
         # Remove path
         domain = domain.split('/')[0]
 
@@ -163,7 +161,17 @@ class TextParser:
 
     def categorize_query_type(self, query: str, business_name: str, query_id: int = None, num_consumer: int = 5) -> str:
         """Categorize query as consumer or business-focused based on position and content."""
+        return self._categorize_one(query, _business_matcher(business_name), query_id, num_consumer)
 
+    def categorize_queries(self, queries: List[str], business_name: str, query_ids: Optional[List[int]] = None,
+                           num_consumer: int = 5) -> List[str]:
+        """Categorize a batch of queries for one business; the business-name matcher is looked up once."""
+        business_re = _business_matcher(business_name)
+        if query_ids is None:
+            return [self._categorize_one(query, business_re, None, num_consumer) for query in queries]
+        return [self._categorize_one(query, business_re, query_id, num_consumer) for query, query_id in zip(queries, query_ids)]
+
+    def _categorize_one(self, query: str, business_re: re.Pattern, query_id: Optional[int], num_consumer: int) -> str:
         # First, try position-based classification if we have query_id
         if query_id is not None:
             if query_id <= num_consumer:
@@ -172,33 +180,17 @@ class TextParser:
                 return "Business"
 
         # Fallback to content-based classification
-        query_lower = query.lower()
-        business_lower = business_name.lower()
-
         # If business name is explicitly mentioned, it's business-focused
-        if business_lower in query_lower:
+        if business_re.search(query):
             return "Business"
 
-        # Strong business indicators (fleet, company operations, bulk pricing, etc.)
-        strong_business_keywords = [
-            "fleet", "company", "business", "bulk pricing", "contractor",
-            "logistics", "rental fleet", "mining", "construction company",
-            "service agreements", "warranty support", "ongoing service",
-            "scalable", "ROI", "extended warranty", "refurbishment programs"
-        ]
-
-        if any(keyword in query_lower for keyword in strong_business_keywords):
+        if self.strong_business_pattern.search(query):
             return "Business"
 
-        # Weaker business indicators that might appear in consumer queries
-        weak_business_keywords = [
-            "review", "opinion", "think about", "better than", "compare",
-            "vs", "versus", "service"
-        ]
-
         # Only classify as business if multiple weak indicators or very specific phrases
-        weak_matches = sum(1 for keyword in weak_business_keywords if keyword in query_lower)
-        if weak_matches >= 2 or "what do people think about" in query_lower or "is X better than" in query_lower:
+        # (distinct keywords, so a repeated "review" still counts once)
+        weak_matches = len({match.lower() for match in self.weak_business_pattern.findall(query)})
+        if weak_matches >= 2 or self.business_phrase_pattern.search(query):
             return "Business"
 
-        return "Consumer"
\ No newline at end of file
+        return "Consumer"